@@ -4,14 +4,21 @@ from flask_jwt_extended import JWTManager
 from flask_mail import Mail, Message
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os, datetime, uuid
 from dotenv import load_dotenv
+from app_dir.log_writer import LogWriter
+from app_dir.payments import PaymentEventApplier
+from app_dir.rate_limit import RateLimiter
 
 # Initilazed extensions
 mail = Mail()
 migrate = Migrate()
 db = SQLAlchemy()
 jwt = JWTManager()
+log_writer = LogWriter()
+payment_applier = PaymentEventApplier()
+limiter = RateLimiter()
 load_dotenv()
 
 ALLOWED_FILES_EXTENSIONS = {"jpeg", 'jpg', 'png', 'pdf', 'docx'}
@@ -76,9 +83,20 @@ def create_app():
         MAIL_PASSWORD=os.getenv('MAIL_PASSWORD'),
         UPLOAD_FOLDER=UPLOAD_FOLDER,
         MAX_CONTENT_LENGTH=16 * 1024 * 1024,
+        COMPRESS_MIN_SIZE=int(os.getenv('COMPRESS_MIN_SIZE', 500)),
+        COMPRESS_LEVEL=int(os.getenv('COMPRESS_LEVEL', 6)),
+        RATELIMIT_ENABLED=os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true',
+        TRUSTED_PROXY_HOPS=int(os.getenv('TRUSTED_PROXY_HOPS', 0)),
+        PAYMENT_WEBHOOK_SECRET=os.getenv('PAYMENT_WEBHOOK_SECRET'),
+        MAINTENANCE_SCHEDULER=os.getenv('MAINTENANCE_SCHEDULER', 'false').lower() == 'true',
         CORS_HEADERS='Content-Type'
     )
 
+    # Take the client address from X-Forwarded-For, trusting only our own proxies
+    if app.config["TRUSTED_PROXY_HOPS"]:
+        hops = app.config["TRUSTED_PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     # Initialize extensions with the app
     CORS(app,
      supports_credentials=True,
@@ -87,9 +105,24 @@ def create_app():
     migrate.init_app(app, db)
     db.init_app(app)
     jwt.init_app(app)
+    log_writer.init_app(app)
+    payment_applier.init_app(app)
+    limiter.init_app(app)
+
+    from app_dir.compression import init_compression
+    init_compression(app)
 
     from app_dir.routes import all_bps
     for bp in all_bps:
         app.register_blueprint(bp)
 
+    from app_dir import ratings  # registers review aggregate listeners
+    from app_dir.maintenance import MaintenanceScheduler
+    MaintenanceScheduler(app)
+    from app_dir.notifications import notification_hub
+    notification_hub.init_app(app)
+    from app_dir.cli import all_commands
+    for command in all_commands:
+        app.cli.add_command(command)
+
     return app
@@ -0,0 +1,210 @@
+import json, threading, time
+from sqlalchemy import event, select, func, union_all, inspect, null, literal, case
+from sqlalchemy.orm import Session
+from app_dir import db
+from app_dir.models import Product, Category, SubCategory
+
+# Columns whose change moves a product between tree nodes or in/out of the counts
+TREE_PRODUCT_FIELDS = ("category_id", "subcategory_id", "is_deleted", "is_active")
+
+# Price facet bucket lower bounds; the last bucket is open-ended
+PRICE_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000)
+SEARCH_SORTS = {
+    "newest": (Product.id.desc(),),
+    "price_asc": (Product.item_price.asc(), Product.id.asc()),
+    "price_desc": (Product.item_price.desc(), Product.id.desc()),
+}
+
+# Upper bound on staleness when another process writes products or categories
+TREE_CACHE_TTL = 60
+
+_tree_lock = threading.Lock()
+_tree_body = None
+_tree_built_at = 0.0
+_tree_generation = 0
+
+
+def _live_products():
+    return db.and_(Product.is_deleted.is_(False), Product.is_active.is_(True))
+
+
+def build_category_tree():
+    """Build the two-level category tree with product counts in one statement."""
+    by_subcategory = (
+        select(
+            Category.id, Category.name, SubCategory.id, SubCategory.name,
+            func.count(Product.id),
+        )
+        .select_from(Category)
+        .outerjoin(SubCategory, SubCategory.category_id == Category.id)
+        .outerjoin(Product, db.and_(Product.subcategory_id == SubCategory.id, _live_products()))
+        .group_by(Category.id, Category.name, SubCategory.id, SubCategory.name)
+    )
+    # Products filed directly under a category without a subcategory
+    direct = (
+        select(
+            Product.category_id, null(), null(), null(),
+            func.count(Product.id),
+        )
+        .where(Product.category_id.isnot(None), Product.subcategory_id.is_(None), _live_products())
+        .group_by(Product.category_id)
+    )
+    rows = db.session.execute(union_all(by_subcategory, direct)).all()
+
+    categories = {}
+    direct_counts = {}
+    for cat_id, cat_name, sub_id, sub_name, count in rows:
+        if cat_name is None:
+            direct_counts[cat_id] = count
+            continue
+        node = categories.setdefault(
+            cat_id, {"id": cat_id, "name": cat_name, "product_count": 0, "subcategories": []}
+        )
+        if sub_id is not None:
+            node["subcategories"].append({"id": sub_id, "name": sub_name, "product_count": count})
+            node["product_count"] += count
+
+    for cat_id, count in direct_counts.items():
+        if cat_id in categories:
+            categories[cat_id]["product_count"] += count
+
+    tree = sorted(categories.values(), key=lambda c: c["name"])
+    for node in tree:
+        node["subcategories"].sort(key=lambda s: s["name"])
+    return tree
+
+
+def _search_conditions(filters, skip=None):
+    """WHERE clauses for `filters`, leaving out facet `skip` so its counts stay selectable."""
+    conds = [Product.is_deleted.is_(False), Product.is_active.is_(True)]
+    if skip != "category" and filters.get("category_id") is not None:
+        conds.append(Product.category_id == filters["category_id"])
+    if skip != "subcategory" and filters.get("subcategory_id") is not None:
+        conds.append(Product.subcategory_id == filters["subcategory_id"])
+    if skip != "price":
+        if filters.get("min_price") is not None:
+            conds.append(Product.item_price >= filters["min_price"])
+        if filters.get("max_price") is not None:
+            conds.append(Product.item_price <= filters["max_price"])
+    if skip != "in_stock" and filters.get("in_stock"):
+        conds.append(Product.item_stock > 0)
+    return conds
+
+
+def _price_bucket():
+    return case(
+        *[(Product.item_price < upper, i) for i, upper in enumerate(PRICE_BUCKETS[1:])],
+        else_=len(PRICE_BUCKETS) - 1,
+    )
+
+
+def search_facets(filters):
+    """Total and per-facet counts for `filters`, as one UNION ALL of grouped aggregates.
+
+    Each facet is counted with every other filter applied but its own, so the
+    client can show how many results picking a different value would give.
+    """
+    in_stock = case((Product.item_stock > 0, 1), else_=0)
+    facet_exprs = {
+        "category": Product.category_id,
+        "subcategory": Product.subcategory_id,
+        "price": _price_bucket(),
+        "in_stock": in_stock,
+    }
+    parts = [
+        select(literal("total"), literal(0), func.count(Product.id)).where(*_search_conditions(filters))
+    ]
+    for name, expr in facet_exprs.items():
+        parts.append(
+            select(literal(name), expr, func.count(Product.id))
+            .where(*_search_conditions(filters, skip=name))
+            .group_by(expr)
+        )
+    rows = db.session.execute(union_all(*parts)).all()
+
+    total = 0
+    facets = {"category": [], "subcategory": [], "price": [], "in_stock": {"true": 0, "false": 0}}
+    for name, value, count in rows:
+        if name == "total":
+            total = count
+        elif name == "in_stock":
+            facets["in_stock"]["true" if value else "false"] = count
+        elif name == "price":
+            upper = PRICE_BUCKETS[value + 1] if value + 1 < len(PRICE_BUCKETS) else None
+            facets["price"].append({"min": PRICE_BUCKETS[value], "max": upper, "count": count})
+        elif value is not None:
+            facets[name].append({"id": value, "count": count})
+    facets["price"].sort(key=lambda b: b["min"])
+    return total, facets
+
+
+def search_products(filters, page=1, per_page=20, sort="newest"):
+    rows = (
+        Product.query.filter(*_search_conditions(filters))
+        .order_by(*SEARCH_SORTS.get(sort, SEARCH_SORTS["newest"]))
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .all()
+    )
+    total, facets = search_facets(filters)
+    return {
+        "products": [product.to_dict() for product in rows],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "facets": facets,
+    }
+
+
+def get_category_tree_json():
+    """Return the serialized tree, rebuilding it after a relevant write or the TTL."""
+    global _tree_body, _tree_built_at
+    body = _tree_body
+    if body is not None and time.monotonic() - _tree_built_at < TREE_CACHE_TTL:
+        return body
+
+    generation = _tree_generation
+    body = json.dumps({"categories": build_category_tree(), "msg": "ok"})
+    with _tree_lock:
+        # Don't publish a tree that raced with an invalidation
+        if generation == _tree_generation:
+            _tree_body = body
+            _tree_built_at = time.monotonic()
+    return body
+
+
+def invalidate_category_tree():
+    global _tree_body, _tree_generation
+    with _tree_lock:
+        _tree_generation += 1
+        _tree_body = None
+
+
+# Writes only invalidate once committed, so readers never cache uncommitted state
+def _mark_dirty(mapper, connection, target):
+    Session.object_session(target).info["category_tree_dirty"] = True
+
+
+def _product_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TREE_PRODUCT_FIELDS):
+        _mark_dirty(mapper, connection, target)
+
+
+for _model in (Category, SubCategory):
+    for _evt in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _evt, _mark_dirty)
+event.listen(Product, "after_insert", _mark_dirty)
+event.listen(Product, "after_delete", _mark_dirty)
+event.listen(Product, "after_update", _product_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("category_tree_dirty", False):
+        invalidate_category_tree()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session):
+    session.info.pop("category_tree_dirty", None)
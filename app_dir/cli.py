@@ -0,0 +1,414 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+
+def _report_timings(label, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000
+    click.echo(f"{label}: {len(timings)} runs, p50 {p50:.1f} ms, p99 {p99:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+
+
+def _scratch_admin():
+    """A throwaway seller that benchmark rows can belong to."""
+    import uuid
+    from app_dir.models import User
+    tag = uuid.uuid4().hex[:8]
+    user = User(username=f"bench-{tag}", email=f"bench-{tag}@example.com", phone=f"bench-{tag}", is_admin=True)
+    user.set_password(uuid.uuid4().hex)
+    user.save()
+    return user
+
+
+catalog_cli = AppGroup("catalog", help="Catalog search.")
+
+
+@catalog_cli.command("benchmark-search")
+@click.option("--products", "product_count", default=1000000, show_default=True)
+@click.option("--categories", "category_count", default=20, show_default=True)
+@click.option("--repeat", default=20, show_default=True, help="Runs per filter combination.")
+def benchmark_search_command(product_count, category_count, repeat):
+    """Seed products and time faceted search over them.
+
+    Inserts its own categories and products, so point DATABASE_URL at a
+    scratch database.
+    """
+    import random, time, uuid
+    from sqlalchemy import insert
+    from app_dir import db
+    from app_dir.models import Category, SubCategory, Product
+    from app_dir.catalog import search_facets, search_products
+
+    admin = _scratch_admin()
+    tag = uuid.uuid4().hex[:8]
+    categories = [Category(name=f"bench-{tag}-{i}") for i in range(category_count)]
+    db.session.add_all(categories)
+    db.session.flush()
+    subcategories = [SubCategory(category_id=c.id, name=f"{c.name}-{j}") for c in categories for j in range(5)]
+    db.session.add_all(subcategories)
+    db.session.commit()
+    pairs = [(s.category_id, s.id) for s in subcategories]
+
+    started = time.perf_counter()
+    table = Product.__table__
+    for start in range(0, product_count, 10000):
+        rows = []
+        for _ in range(min(10000, product_count - start)):
+            category_id, subcategory_id = random.choice(pairs)
+            rows.append({
+                "admin_id": admin.id, "category_id": category_id, "subcategory_id": subcategory_id,
+                "item_name": f"bench-{tag}", "item_price": round(random.uniform(1, 1500), 2),
+                "item_stock": random.choice([0, 0, 5, 20, 100]),
+                "is_deleted": random.random() < 0.02, "is_active": True,
+            })
+        db.session.execute(insert(table), rows)
+        db.session.commit()
+    click.echo(f"Seeded {product_count} products in {time.perf_counter() - started:.1f}s")
+
+    category_id, subcategory_id = random.choice(pairs)
+    cases = {
+        "no filters": {},
+        "category": {"category_id": category_id},
+        "category + price": {"category_id": category_id, "min_price": 25, "max_price": 250},
+        "subcategory + in stock": {"subcategory_id": subcategory_id, "in_stock": True},
+        "price + in stock": {"min_price": 100, "max_price": 500, "in_stock": True},
+    }
+    for label, filters in cases.items():
+        facet_timings, search_timings = [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            search_facets(filters)
+            facet_timings.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            search_products(filters)
+            search_timings.append(time.perf_counter() - t0)
+            db.session.rollback()
+        _report_timings(f"facets [{label}]", facet_timings)
+        _report_timings(f"search [{label}]", search_timings)
+
+
+ratings_cli = AppGroup("ratings", help="Product rating aggregates.")
+
+
+@ratings_cli.command("rebuild")
+@click.option("--batch-size", default=1000, show_default=True)
+def rebuild_ratings_command(batch_size):
+    """Recompute rating aggregates from product_reviews to repair drift."""
+    from app_dir.ratings import rebuild_ratings
+    count = rebuild_ratings(batch_size)
+    click.echo(f"Rebuilt ratings for {count} products")
+
+
+maintenance_cli = AppGroup("maintenance", help="Purge expired and aged rows.")
+
+
+@maintenance_cli.command("run")
+@click.option("--job", "jobs", multiple=True, help="Job to run (repeatable). Defaults to all jobs.")
+def run_maintenance_command(jobs):
+    """Run purge jobs once, e.g. from cron."""
+    from app_dir.maintenance import JOBS, run_job
+    for name in jobs or JOBS:
+        if name not in JOBS:
+            raise click.BadParameter(f"Unknown job {name}. Choose from {', '.join(JOBS)}")
+        run = run_job(current_app._get_current_object(), name)
+        status = f"failed: {run['error']}" if run["error"] else "ok"
+        click.echo(
+            f"{name}: deleted {run['rows_deleted']} rows in {run['batches']} batches "
+            f"({run['duration_ms']:.1f} ms) {status}"
+        )
+
+
+payments_cli = AppGroup("payments", help="Payment webhook processing.")
+
+
+@payments_cli.command("apply-pending")
+def apply_pending_command():
+    """Apply stored webhook transactions that were never applied."""
+    applier = current_app.extensions["payment_applier"]
+    click.echo(f"Applied {applier.apply_pending()} pending transactions")
+
+
+@payments_cli.command("simulate")
+@click.option("--payments", "payment_count", default=100, show_default=True)
+@click.option("--events", "event_count", default=2000, show_default=True)
+@click.option("--duplicate-rate", default=0.3, show_default=True, help="Share of events that are retries.")
+@click.option("--threads", default=8, show_default=True)
+def simulate_command(payment_count, event_count, duplicate_rate, threads):
+    """Replay a burst of gateway webhooks, with retries, against /payments/webhook.
+
+    Creates its own user, orders and payments, so point DATABASE_URL at a
+    scratch database. Events are signed with PAYMENT_WEBHOOK_SECRET, or with
+    a throwaway secret when none is configured.
+    """
+    import hashlib, hmac, json, random, threading, time, uuid
+    from app_dir import db
+    from app_dir.models import User, Order, Payment
+
+    app = current_app._get_current_object()
+    secret = app.config.get("PAYMENT_WEBHOOK_SECRET") or uuid.uuid4().hex
+    app.config["PAYMENT_WEBHOOK_SECRET"] = secret
+    tag = uuid.uuid4().hex[:8]
+    user = User(username=f"sim-{tag}", email=f"sim-{tag}@example.com", phone=f"sim-{tag}")
+    user.set_password(uuid.uuid4().hex)
+    user.save()
+    payments = []
+    for _ in range(payment_count):
+        order = Order(user_id=user.id, total_price=10)
+        order.payment = Payment(payment_method="card", amount=10)
+        db.session.add(order)
+        payments.append(order.payment)
+    db.session.commit()
+    payment_ids = [payment.id for payment in payments]
+
+    unique = []
+    for _ in range(int(event_count * (1 - duplicate_rate)) or 1):
+        status = random.choice(["succeeded", "succeeded", "succeeded", "failed", "pending"])
+        unique.append({"transaction_id": f"sim-{uuid.uuid4().hex}", "payment_id": random.choice(payment_ids), "status": status})
+    events = unique + [random.choice(unique) for _ in range(event_count - len(unique))]
+    random.shuffle(events)
+
+    results = {"ok": 0, "duplicate": 0, "error": 0}
+    lock = threading.Lock()
+    latencies = []
+
+    def worker(chunk):
+        client = app.test_client()
+        for event in chunk:
+            body = json.dumps(event).encode("utf-8")
+            signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            started = time.perf_counter()
+            resp = client.post(
+                "/payments/webhook", data=body, content_type="application/json",
+                headers={"X-Signature": signature},
+            )
+            elapsed = time.perf_counter() - started
+            key = "error" if resp.status_code != 200 else ("duplicate" if resp.json.get("duplicate") else "ok")
+            with lock:
+                results[key] += 1
+                latencies.append(elapsed)
+
+    chunks = [events[i::threads] for i in range(threads)]
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000
+    click.echo(
+        f"{len(events)} events in {elapsed:.2f}s ({len(events) / elapsed:.0f}/s), "
+        f"p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+    )
+    click.echo(f"stored {results['ok']}, duplicates {results['duplicate']}, errors {results['error']}")
+
+    app.extensions["payment_applier"].shutdown()
+    paid = Payment.query.filter(Payment.id.in_(payment_ids), Payment.payment_status == "Paid").count()
+    click.echo(f"{paid}/{len(payment_ids)} simulated payments marked Paid")
+
+
+notifications_cli = AppGroup("notifications", help="Notification streams.")
+
+
+@notifications_cli.command("benchmark-streams")
+@click.option("--streams", "stream_count", default=500, show_default=True, help="Concurrently open SSE streams.")
+@click.option("--users", "user_count", default=100, show_default=True)
+@click.option("--per-user", default=5, show_default=True, help="Notifications created for each user.")
+@click.option("--timeout", default=60, show_default=True, help="Seconds to wait for delivery.")
+def benchmark_streams_command(stream_count, user_count, per_user, timeout):
+    """Hold many /notifications/stream connections open and time delivery to them.
+
+    Creates its own users and notifications, so point DATABASE_URL at a
+    scratch database.
+    """
+    import json, threading, time, uuid
+    from flask_jwt_extended import create_access_token
+    from app_dir import db
+    from app_dir.models import User, Notification
+    from app_dir.notifications import notification_hub
+
+    app = current_app._get_current_object()
+    tag = uuid.uuid4().hex[:8]
+    users = [User(username=f"bench-{tag}-{i}", email=f"bench-{tag}-{i}@example.com", phone=f"b{tag}{i}") for i in range(user_count)]
+    for user in users:
+        user.set_password(tag)
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+    tokens = {user_id: create_access_token(identity=str(user_id)) for user_id in user_ids}
+    db.session.remove()
+
+    opened = threading.Barrier(stream_count + 1)
+    received = []
+    failures = []
+    lock = threading.Lock()
+
+    def reader(user_id):
+        client = app.test_client()
+        client.set_cookie(app.config["JWT_ACCESS_COOKIE_NAME"], tokens[user_id])
+        resp = client.get("/notifications/stream", buffered=False)
+        try:
+            if resp.status_code != 200:
+                failures.append(resp.status_code)
+                opened.wait()
+                return
+            chunks = iter(resp.response)
+            next(chunks)  # initial unread count
+            opened.wait()
+            deadline = time.monotonic() + timeout
+            seen = 0
+            for chunk in chunks:
+                arrived = time.perf_counter()
+                text = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if text.startswith("event: notification"):
+                    data = json.loads(text.split("data: ", 1)[1])
+                    with lock:
+                        received.append((data["id"], arrived))
+                    seen += 1
+                if seen >= per_user or time.monotonic() > deadline:
+                    break
+        finally:
+            resp.close()
+
+    readers = [threading.Thread(target=reader, args=(user_ids[i % user_count],), daemon=True) for i in range(stream_count)]
+    started = time.perf_counter()
+    for t in readers:
+        t.start()
+    opened.wait()
+    click.echo(f"Opened {stream_count - len(failures)} streams in {time.perf_counter() - started:.2f}s "
+               f"({notification_hub.broker.stream_count()} subscribed, {len(failures)} failed)")
+
+    sent = {}
+    started = time.perf_counter()
+    for round_ in range(per_user):
+        for user_id in user_ids:
+            notification = Notification(user_id=user_id, title="Benchmark", message=f"round {round_}")
+            db.session.add(notification)
+            committed = time.perf_counter()
+            db.session.commit()
+            sent[notification.id] = committed
+    publish_elapsed = time.perf_counter() - started
+
+    for t in readers:
+        t.join(timeout)
+    elapsed = time.perf_counter() - started
+    expected = (stream_count - len(failures)) * per_user
+    click.echo(f"Created {len(sent)} notifications in {publish_elapsed:.2f}s; "
+               f"delivered {len(received)}/{expected} in {elapsed:.2f}s ({len(received) / elapsed:.0f}/s)")
+    if received:
+        _report_timings("delivery latency", [arrived - sent[nid] for nid, arrived in received if nid in sent])
+    click.echo(f"{notification_hub.broker.stream_count()} streams still subscribed")
+
+
+sales_cli = AppGroup("sales", help="Sales analytics rollups.")
+
+
+@sales_cli.command("backfill")
+@click.option("--chunk-size", default=1000, show_default=True)
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="First order day (inclusive).")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Last order day (inclusive).")
+def backfill_sales_command(chunk_size, start, end):
+    """Rebuild daily product/seller rollups from paid orders."""
+    from app_dir import db
+    from app_dir.sales import backfill
+    count = backfill(db.engine, chunk_size, start.date() if start else None, end.date() if end else None)
+    click.echo(f"Rolled up {count} paid orders")
+
+
+recommendations_cli = AppGroup("recommendations", help="Frequently bought together.")
+
+
+@recommendations_cli.command("build")
+@click.option("--top-k", default=10, show_default=True)
+@click.option("--chunk-size", default=5000, show_default=True, help="Order ids per streamed chunk.")
+@click.option("--workers", default=0, show_default=True, help="Process pool size; 0 runs in this process.")
+def build_recommendations_command(top_k, chunk_size, workers):
+    """Recompute product co-occurrence neighbours from order_items."""
+    import time
+    from app_dir import db
+    from app_dir.recommendations import build_recommendations
+    started = time.perf_counter()
+    count = build_recommendations(db.engine, top_k, chunk_size, workers)
+    click.echo(f"Wrote {count} recommendations in {time.perf_counter() - started:.2f}s")
+
+
+@recommendations_cli.command("benchmark")
+@click.option("--orders", "order_counts", default="10000,50000,100000", show_default=True,
+              help="Comma-separated order counts to time the build at.")
+@click.option("--products", "product_count", default=5000, show_default=True)
+@click.option("--max-basket", default=6, show_default=True)
+@click.option("--top-k", default=10, show_default=True)
+@click.option("--workers", default=0, show_default=True)
+def benchmark_recommendations_command(order_counts, product_count, max_basket, top_k, workers):
+    """Grow a synthetic order history and time the build at each size.
+
+    Inserts its own products, orders and items, so point DATABASE_URL at a
+    scratch database.
+    """
+    import random, time
+    from sqlalchemy import insert
+    from app_dir import db
+    from app_dir.models import Product, Order, OrderItem
+    from app_dir.recommendations import build_recommendations
+
+    targets = sorted(int(n) for n in order_counts.split(","))
+    admin = _scratch_admin()
+    products = Product.__table__
+    product_ids = db.session.execute(
+        insert(products).returning(products.c.id, sort_by_parameter_order=True),
+        [{"admin_id": admin.id, "item_name": f"bench {i}", "item_price": 10, "item_stock": 10} for i in range(product_count)],
+    ).scalars().all()
+    db.session.commit()
+    # Long-tailed popularity, like real catalogs
+    weights = [1 / rank for rank in range(1, product_count + 1)]
+
+    orders, items = Order.__table__, OrderItem.__table__
+    placed = 0
+    for target in targets:
+        started = time.perf_counter()
+        while placed < target:
+            size = min(1000, target - placed)
+            order_ids = db.session.execute(
+                insert(orders).returning(orders.c.id, sort_by_parameter_order=True),
+                [{"user_id": admin.id, "total_price": 0, "status": "Paid"} for _ in range(size)],
+            ).scalars().all()
+            rows = []
+            for order_id in order_ids:
+                basket = set(random.choices(product_ids, weights, k=random.randint(1, max_basket)))
+                rows.extend(
+                    {"order_id": order_id, "product_id": product_id, "user_id": admin.id, "quantity": 1, "unit_price": 10}
+                    for product_id in basket
+                )
+            db.session.execute(insert(items), rows)
+            db.session.commit()
+            placed += size
+        seeded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        count = build_recommendations(db.engine, top_k, workers=workers)
+        click.echo(f"{placed} orders: build {time.perf_counter() - started:.2f}s, "
+                   f"{count} recommendations (seeding took {seeded:.1f}s)")
+
+
+wishlist_cli = AppGroup("wishlist", help="Wishlist alerts.")
+
+
+@wishlist_cli.command("alerts")
+@click.option("--batch-size", default=500, show_default=True, help="Changed products per transaction.")
+@click.option("--window-hours", default=24, show_default=True, help="At most one alert per user, product and kind in this window.")
+def wishlist_alerts_command(batch_size, window_hours):
+    """Notify wishlists about price drops and restocks since the last run."""
+    import datetime
+    from app_dir import db
+    from app_dir.wishlist_alerts import run_wishlist_alerts
+    price_alerts, stock_alerts = run_wishlist_alerts(
+        db.engine, batch_size, datetime.timedelta(hours=window_hours)
+    )
+    click.echo(f"Sent {price_alerts} price drop and {stock_alerts} back in stock alerts")
+
+
+all_commands = [catalog_cli, ratings_cli, maintenance_cli, payments_cli, notifications_cli, sales_cli, recommendations_cli, wishlist_cli]
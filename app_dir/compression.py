@@ -0,0 +1,157 @@
+import gzip, zlib, hashlib, threading
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/javascript", "text/html", "text/plain", "text/css", "text/csv",
+}
+
+_cacheable_endpoints = set()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cache_compressed(view):
+    """Keep compressed copies of this view's responses so repeat hits skip compression."""
+    _cacheable_endpoints.add(view.__name__)
+    return view
+
+
+def _available():
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding, allowed):
+    """Pick the best encoding from an Accept-Encoding header, or None."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            weights[token] = q
+
+    best, best_q = None, 0.0
+    for enc in allowed:
+        q = weights.get(enc, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress_bytes(data, encoding, config):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=config["COMPRESS_LEVEL"])
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BR_LEVEL"])
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=config["COMPRESS_ZSTD_LEVEL"]).compress(data)
+    raise ValueError(f"Unsupported encoding {encoding}")
+
+
+def compress_stream(chunks, encoding, config):
+    """Compress an iterable of chunks, flushing after each so clients see data early."""
+    if encoding == "gzip":
+        comp = zlib.compressobj(config["COMPRESS_LEVEL"], zlib.DEFLATED, 31)
+        process = comp.compress
+        flush = lambda: comp.flush(zlib.Z_SYNC_FLUSH)
+        finish = comp.flush
+    elif encoding == "br":
+        comp = brotli.Compressor(quality=config["COMPRESS_BR_LEVEL"])
+        process, flush, finish = comp.process, comp.flush, comp.finish
+    else:
+        comp = zstandard.ZstdCompressor(level=config["COMPRESS_ZSTD_LEVEL"]).compressobj()
+        process = comp.compress
+        flush = lambda: comp.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        finish = comp.flush
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = process(chunk) + flush()
+        if out:
+            yield out
+    tail = finish()
+    if tail:
+        yield tail
+
+
+def _cached_compress(data, encoding, config):
+    key = (hashlib.sha1(data).digest(), encoding)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+    body = compress_bytes(data, encoding, config)
+    with _cache_lock:
+        _cache[key] = body
+        while len(_cache) > config["COMPRESS_CACHE_SIZE"]:
+            _cache.popitem(last=False)
+    return body
+
+
+def _compress_response(response, config):
+    if (
+        response.direct_passthrough
+        or not 200 <= response.status_code < 300
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), config["COMPRESS_ALGORITHMS"])
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, config)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        if request.endpoint and request.endpoint.rsplit(".", 1)[-1] in _cacheable_endpoints:
+            body = _cached_compress(data, encoding, config)
+        else:
+            body = compress_bytes(data, encoding, config)
+        response.set_data(body)
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault("COMPRESS_MIN_SIZE", 500)
+    app.config.setdefault("COMPRESS_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BR_LEVEL", 4)
+    app.config.setdefault("COMPRESS_ZSTD_LEVEL", 3)
+    app.config.setdefault("COMPRESS_CACHE_SIZE", 128)
+    app.config.setdefault("COMPRESS_ALGORITHMS", _available())
+
+    @app.after_request
+    def compress(response):
+        return _compress_response(response, app.config)
@@ -0,0 +1,157 @@
+import threading, datetime, time
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import event, select, update, inspect, or_
+from sqlalchemy.orm import Session
+from app_dir import db
+from app_dir.models import Coupon, Order, Payment
+
+CENT = Decimal("0.01")
+# Upper bound on staleness when another process edits coupons
+CACHE_TTL = 60
+
+_lock = threading.Lock()
+_coupons = None
+_loaded_at = 0.0
+_generation = 0
+
+
+class CouponError(Exception):
+    pass
+
+
+def _load_coupons():
+    """code -> immutable snapshot of every active coupon, from one query."""
+    rows = db.session.execute(
+        select(
+            Coupon.id, Coupon.code, Coupon.discount_type, Coupon.value,
+            Coupon.start_date, Coupon.expiration_date, Coupon.usage_limit,
+        ).where(Coupon.active.is_(True))
+    ).all()
+    return {row.code.upper(): row._asdict() for row in rows}
+
+
+def get_coupons():
+    global _coupons, _loaded_at
+    coupons = _coupons
+    if coupons is not None and time.monotonic() - _loaded_at < CACHE_TTL:
+        return coupons
+    generation = _generation
+    coupons = _load_coupons()
+    with _lock:
+        if generation == _generation:
+            _coupons = coupons
+            _loaded_at = time.monotonic()
+    return coupons
+
+
+def invalidate_coupons():
+    global _coupons, _generation
+    with _lock:
+        _generation += 1
+        _coupons = None
+
+
+def compute_discount(coupon, subtotal):
+    subtotal = Decimal(str(subtotal))
+    if subtotal < 0:
+        raise CouponError("Invalid subtotal")
+    if coupon["discount_type"] == "percent":
+        discount = subtotal * Decimal(coupon["value"]) / 100
+    elif coupon["discount_type"] == "fixed":
+        discount = Decimal(coupon["value"])
+    else:
+        raise CouponError("Unsupported coupon type")
+    return min(discount, subtotal).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def validate_coupon(code, subtotal, now=None):
+    """Check a code against the cached coupons; no DB access. Returns (coupon, discount)."""
+    if not code:
+        raise CouponError("Coupon code required")
+    if not isinstance(code, str):
+        raise CouponError("Invalid coupon code")
+    coupon = get_coupons().get(code.strip().upper())
+    if coupon is None:
+        raise CouponError("Invalid coupon code")
+    now = now or datetime.datetime.utcnow()
+    if now < coupon["start_date"]:
+        raise CouponError("Coupon is not active yet")
+    if now > coupon["expiration_date"]:
+        raise CouponError("Coupon expired")
+    return coupon, compute_discount(coupon, subtotal)
+
+
+def redeem_coupon(code, order_id, user_id, now=None):
+    """Apply a coupon to one of the user's pending orders and count the use.
+
+    The discount comes off the order total (and its pending payment), and
+    Order.coupon_id records the redemption, so an order takes one coupon
+    and a use can't be spent without an order. The usage limit is enforced
+    by a conditional UPDATE, so concurrent redemptions can never push
+    used_count past usage_limit. Runs in the caller's transaction; the caller
+    commits, or rolls back on CouponError. Returns (coupon, discount, new total).
+    """
+    open_order = (
+        Order.id == order_id,
+        Order.user_id == user_id,
+        Order.status == "Pending",
+        Order.coupon_id.is_(None),
+    )
+    total = db.session.execute(select(Order.total_price).where(*open_order)).scalar()
+    if total is None:
+        raise CouponError("Order not found or not eligible for a coupon")
+
+    coupon, discount = validate_coupon(code, total, now)
+    result = db.session.execute(
+        update(Coupon)
+        .where(
+            Coupon.id == coupon["id"],
+            Coupon.active.is_(True),
+            or_(Coupon.usage_limit == 0, Coupon.used_count < Coupon.usage_limit),
+        )
+        .values(used_count=Coupon.used_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise CouponError("Coupon usage limit reached")
+
+    new_total = Decimal(str(total)) - discount
+    result = db.session.execute(
+        update(Order)
+        .where(*open_order)
+        .values(coupon_id=coupon["id"], total_price=new_total)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        # A concurrent redemption got this order first
+        raise CouponError("Order not found or not eligible for a coupon")
+    db.session.execute(
+        update(Payment)
+        .where(Payment.order_id == order_id, Payment.payment_status == "Pending")
+        .values(amount=new_total)
+        .execution_options(synchronize_session=False)
+    )
+    return coupon, discount, new_total
+
+
+# Cache is dropped after any committed coupon write other than a redemption count
+def _mark_dirty(mapper, connection, target):
+    state = inspect(target)
+    changed = [attr.key for attr in state.attrs if attr.history.has_changes()]
+    if changed != ["used_count"]:
+        Session.object_session(target).info["coupons_dirty"] = True
+
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(Coupon, _evt, _mark_dirty)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("coupons_dirty", False):
+        invalidate_coupons()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session):
+    session.info.pop("coupons_dirty", None)
@@ -0,0 +1,147 @@
+import os, hashlib, logging, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import request, has_request_context
+from app_dir import UPLOAD_FOLDER
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are skipped, originals are still served
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = {"jpeg", "jpg", "png"}
+# variant name -> longest edge in pixels
+THUMBNAIL_SIZES = {"thumb": 150, "small": 400, "medium": 800}
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", 2))
+
+_executor = None
+_executor_lock = threading.Lock()
+_ready_variants = set()
+logger = logging.getLogger(__name__)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbs")
+    return _executor
+
+
+def _extension(filename):
+    if "." not in filename:
+        return ""
+    ext = filename.rsplit(".", 1)[1].lower()
+    return "jpg" if ext == "jpeg" else ext
+
+
+def variant_name(digest, size, fmt):
+    return f"{digest}_{size}.{fmt}"
+
+
+def save_upload(file_storage):
+    """Stream an upload to disk while hashing it and return its relative path.
+
+    Files are stored under their sha256 digest, so uploading the same image
+    twice writes it only once. Thumbnails are generated in the background.
+    """
+    ext = _extension(file_storage.filename)
+    hasher = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+        digest = hasher.hexdigest()
+        filename = f"{digest}.{ext}" if ext else digest
+        final_path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if ext in {"jpg", "png"} and Image is not None:
+        future = _get_executor().submit(generate_thumbnails, final_path, digest)
+        future.add_done_callback(_log_thumbnail_failure)
+
+    return f"uploads/{filename}"
+
+
+def _log_thumbnail_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Thumbnail generation failed", exc_info=error)
+
+
+def generate_thumbnails(source_path, digest):
+    pending = [
+        (size, fmt) for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS
+        if not os.path.exists(os.path.join(UPLOAD_FOLDER, variant_name(digest, size, fmt)))
+    ]
+    if not pending:
+        return
+
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        for size, fmt in pending:
+            edge = THUMBNAIL_SIZES[size]
+            thumb = img.copy()
+            thumb.thumbnail((edge, edge))
+            if fmt == "jpg" and thumb.mode not in ("RGB", "L"):
+                thumb = thumb.convert("RGB")
+            name = variant_name(digest, size, fmt)
+            tmp_path = os.path.join(UPLOAD_FOLDER, f"{name}.part")
+            thumb.save(tmp_path, THUMBNAIL_FORMATS[fmt], quality=80)
+            os.replace(tmp_path, os.path.join(UPLOAD_FOLDER, name))
+            _ready_variants.add(name)
+
+
+def _variant_exists(name):
+    if name in _ready_variants:
+        return True
+    if os.path.exists(os.path.join(UPLOAD_FOLDER, name)):
+        _ready_variants.add(name)
+        return True
+    return False
+
+
+def resolve_photo(relative_path, size=None, fmt=None):
+    """Return the stored variant of `relative_path` asked for by the request.
+
+    `size` defaults to the `img` query arg and `fmt` to the `img_fmt` query
+    arg ("webp" or "jpg", default "jpg"). The format is explicit because API
+    calls send a JSON Accept header, not the browser's image one. Falls back
+    to the original file when the variant is not generated yet.
+    """
+    if not relative_path or not relative_path.startswith("uploads/"):
+        return relative_path
+    if has_request_context():
+        if size is None:
+            size = request.args.get("img")
+        if fmt is None:
+            fmt = request.args.get("img_fmt")
+    if size not in THUMBNAIL_SIZES:
+        return relative_path
+
+    digest = relative_path[len("uploads/"):].split(".", 1)[0]
+    if fmt not in THUMBNAIL_FORMATS:
+        fmt = "jpg"
+    name = variant_name(digest, size, fmt)
+    if _variant_exists(name):
+        return f"uploads/{name}"
+    return relative_path
+
+
+def shutdown(wait=True):
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
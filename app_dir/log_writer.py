@@ -0,0 +1,171 @@
+import atexit, queue, random, threading, time, datetime
+from sqlalchemy import insert
+
+
+class LogWriter:
+    """Buffers ActivityLog/InventoryLog rows and writes them in the background.
+
+    Request handlers only enqueue; a worker thread flushes with multi-row
+    INSERTs on its own connection once `batch_size` events are waiting or
+    `flush_interval` seconds have passed. Above the high-water mark events are
+    sampled, and a full queue blocks for up to `block_timeout` before dropping.
+    """
+
+    def __init__(self, app=None):
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0, "dropped": 0, "sampled_out": 0, "written": 0, "flushes": 0, "errors": 0,
+            "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app_dir import db
+        from app_dir.models import ActivityLog, InventoryLog
+
+        app.config.setdefault("LOG_WRITER_QUEUE_SIZE", 10000)
+        app.config.setdefault("LOG_WRITER_BATCH_SIZE", 500)
+        app.config.setdefault("LOG_WRITER_FLUSH_INTERVAL", 1.0)
+        app.config.setdefault("LOG_WRITER_HIGH_WATER", 0.8)
+        app.config.setdefault("LOG_WRITER_SAMPLE_RATE", 0.1)
+        app.config.setdefault("LOG_WRITER_BLOCK_TIMEOUT", 0.05)
+
+        self.batch_size = app.config["LOG_WRITER_BATCH_SIZE"]
+        self.flush_interval = app.config["LOG_WRITER_FLUSH_INTERVAL"]
+        self.sample_rate = app.config["LOG_WRITER_SAMPLE_RATE"]
+        self.block_timeout = app.config["LOG_WRITER_BLOCK_TIMEOUT"]
+        self.max_size = app.config["LOG_WRITER_QUEUE_SIZE"]
+        self.high_water = int(self.max_size * app.config["LOG_WRITER_HIGH_WATER"])
+        self.logger = app.logger
+        self._tables = {"activity": ActivityLog.__table__, "inventory": InventoryLog.__table__}
+        self._queue = queue.Queue(maxsize=self.max_size)
+        with app.app_context():
+            self._engine = db.engine
+
+        app.extensions["log_writer"] = self
+        atexit.register(self.shutdown)
+
+    # Producers (request handlers)
+
+    def log_activity(self, user_id, event_type, ip_address=None, user_agent=None):
+        self._put("activity", {
+            "user_id": user_id,
+            "event_type": event_type,
+            "ip_address": ip_address,
+            "user_agent": (user_agent or "")[:300] or None,
+            "created_at": datetime.datetime.utcnow(),
+        })
+
+    def log_inventory(self, product_id, previous_stock, new_stock, change_type, note=None):
+        self._put("inventory", {
+            "product_id": product_id,
+            "previous_stock": previous_stock,
+            "new_stock": new_stock,
+            "change_type": change_type,
+            "note": note,
+            "timestamp": datetime.datetime.utcnow(),
+        })
+
+    def _put(self, kind, row):
+        if self._queue is None:
+            return
+        self._ensure_worker()
+        if self._queue.qsize() >= self.high_water and random.random() >= self.sample_rate:
+            self._bump("sampled_out")
+            return
+        try:
+            self._queue.put((kind, row), timeout=self.block_timeout)
+        except queue.Full:
+            self._bump("dropped")
+            return
+        self._bump("enqueued")
+
+    # Worker
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        self.drain()
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def drain(self):
+        """Flush everything currently queued from the calling thread."""
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        grouped = {}
+        for kind, row in batch:
+            grouped.setdefault(kind, []).append(row)
+
+        started = time.perf_counter()
+        try:
+            with self._engine.begin() as conn:
+                for kind, rows in grouped.items():
+                    conn.execute(insert(self._tables[kind]).values(rows))
+        except Exception:
+            self._bump("errors")
+            self.logger.exception("Log writer failed to flush %d events", len(batch))
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._stats_lock:
+            self._stats["written"] += len(batch)
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+            self._stats["total_flush_ms"] += elapsed_ms
+        self.logger.debug("Log writer flushed %d events in %.2f ms", len(batch), elapsed_ms)
+
+    def _bump(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    def shutdown(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        elif self._queue is not None:
+            self.drain()
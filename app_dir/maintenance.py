@@ -0,0 +1,146 @@
+import threading, time, datetime
+from sqlalchemy import select, delete, insert, or_
+from app_dir.models import OTP, CartItem, ActivityLog, Notification, MaintenanceRun
+
+
+def _expired_otps(now, config):
+    return or_(OTP.expires_at < now, OTP.used.is_(True))
+
+
+def _stale_carts(now, config):
+    return CartItem.update_date < now - datetime.timedelta(days=config["MAINTENANCE_CART_TTL_DAYS"])
+
+
+def _old_activity(now, config):
+    return ActivityLog.created_at < now - datetime.timedelta(days=config["MAINTENANCE_LOG_TTL_DAYS"])
+
+
+def _old_notifications(now, config):
+    cutoff = now - datetime.timedelta(days=config["MAINTENANCE_NOTIFICATION_TTL_DAYS"])
+    return Notification.is_read.is_(True) & (Notification.created_at < cutoff)
+
+
+# job name -> (model, condition builder, default interval in seconds)
+JOBS = {
+    "otps": (OTP, _expired_otps, 15 * 60),
+    "carts": (CartItem, _stale_carts, 6 * 3600),
+    "activity_logs": (ActivityLog, _old_activity, 24 * 3600),
+    "notifications": (Notification, _old_notifications, 24 * 3600),
+}
+
+
+def purge(engine, model, condition, batch_size, pause=0.0):
+    """Delete rows matching `condition` in id-keyed batches, one short transaction each.
+
+    Returns (rows_deleted, batches).
+    """
+    deleted = batches = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(model.id).where(model.id > last_id, condition)
+                .order_by(model.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(model.__table__).where(model.id.in_(ids)))
+        deleted += len(ids)
+        batches += 1
+        last_id = ids[-1]
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted, batches
+
+
+def run_job(app, name):
+    """Run one maintenance job and record a MaintenanceRun row for it."""
+    from app_dir import db
+    model, condition, _ = JOBS[name]
+    config = app.config
+    started_at = datetime.datetime.utcnow()
+    started = time.perf_counter()
+    deleted = batches = 0
+    error = None
+
+    with app.app_context():
+        engine = db.engine
+        try:
+            deleted, batches = purge(
+                engine, model, condition(started_at, config),
+                config["MAINTENANCE_BATCH_SIZE"], config["MAINTENANCE_BATCH_PAUSE"],
+            )
+        except Exception as e:
+            error = str(e)
+            app.logger.exception("Maintenance job %s failed", name)
+
+        run = {
+            "job": name,
+            "started_at": started_at,
+            "duration_ms": (time.perf_counter() - started) * 1000,
+            "rows_deleted": deleted,
+            "batches": batches,
+            "error": error,
+        }
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(MaintenanceRun.__table__).values(**run))
+        except Exception:
+            # Losing one metrics row must not stop the scheduler thread
+            app.logger.exception("Failed to record maintenance run for %s", name)
+    return run
+
+
+class MaintenanceScheduler:
+    """Runs the purge jobs on their intervals from a background thread.
+
+    Only enable it (MAINTENANCE_SCHEDULER=True) in one process per deployment,
+    or drive the same jobs from cron with `flask maintenance run`.
+    """
+
+    def __init__(self, app=None):
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("MAINTENANCE_SCHEDULER", False)
+        app.config.setdefault("MAINTENANCE_BATCH_SIZE", 500)
+        app.config.setdefault("MAINTENANCE_BATCH_PAUSE", 0.05)
+        app.config.setdefault("MAINTENANCE_CART_TTL_DAYS", 30)
+        app.config.setdefault("MAINTENANCE_LOG_TTL_DAYS", 90)
+        app.config.setdefault("MAINTENANCE_NOTIFICATION_TTL_DAYS", 90)
+        app.config.setdefault("MAINTENANCE_INTERVALS", {})
+        self.app = app
+        app.extensions["maintenance"] = self
+        if app.config["MAINTENANCE_SCHEDULER"]:
+            self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        intervals = {name: self.app.config["MAINTENANCE_INTERVALS"].get(name, job[2]) for name, job in JOBS.items()}
+        next_run = {name: time.monotonic() for name in JOBS}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for name, due in next_run.items():
+                if due <= now:
+                    try:
+                        run_job(self.app, name)
+                    except Exception:
+                        self.app.logger.exception("Maintenance job %s failed", name)
+                    next_run[name] = time.monotonic() + intervals[name]
+            self._stop.wait(max(min(next_run.values()) - time.monotonic(), 1))
@@ -2,8 +2,9 @@
 from app_dir import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-import uuid
+import uuid, zlib
 from sqlalchemy import event
+from app_dir.images import resolve_photo
 
 
 # Helpers
@@ -14,6 +15,8 @@ def generate_sku():
 # BASE MODEL (used only by core tables)
 class BaseModel(db.Model):
     __abstract__ = True
+    # upload paths resolved to the requested thumbnail variant in to_dict
+    __photo_fields__ = ()
 
     id = db.Column(db.Integer, primary_key=True)
     update_date = db.Column(
@@ -51,6 +54,8 @@ class BaseModel(db.Model):
             value = getattr(self, col.name)
             if value is None and not include_nulls:
                 continue
+            if col.name in self.__photo_fields__:
+                value = resolve_photo(value)
             data[col.name] = value
         return data
 
@@ -84,6 +89,7 @@ class BaseModel(db.Model):
 # CORE TABLES (inherit BaseModel)
 class User(BaseModel):
     __tablename__ = "users"
+    __photo_fields__ = ("user_photo",)
 
     username = db.Column(db.String(100), nullable=False, unique=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -129,6 +135,8 @@ class User(BaseModel):
 
 class OTP(db.Model):
     __tablename__ = "otps"
+    # check_otp looks up the newest unused code per email
+    __table_args__ = (db.Index("ix_otps_email_used_created", "email", "used", "created_at"),)
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), nullable=False, index=True)
     code_hash = db.Column(db.String(255), nullable=False)
@@ -149,6 +157,13 @@ class OTP(db.Model):
 
 class Product(BaseModel):
     __tablename__ = "products"
+    __photo_fields__ = ("item_photo",)
+    # Composite indexes backing faceted search (filter column, then price range)
+    __table_args__ = (
+        db.Index("ix_products_category_price", "category_id", "is_deleted", "item_price"),
+        db.Index("ix_products_subcategory_price", "subcategory_id", "is_deleted", "item_price"),
+        db.Index("ix_products_live_price", "is_deleted", "is_active", "item_price"),
+    )
 
     admin_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
@@ -170,6 +185,15 @@ class Product(BaseModel):
     cart_items = db.relationship(
         "CartItem", backref="product", cascade="all, delete-orphan", lazy="select"
     )
+    # Joined so catalog listings get ratings in the same query
+    rating_stats = db.relationship(
+        "ProductRating", backref="product", uselist=False, cascade="all, delete-orphan", lazy="joined"
+    )
+
+    def to_dict(self, include_nulls=False):
+        data = super().to_dict(include_nulls)
+        data["rating"] = (self.rating_stats or ProductRating()).summary()
+        return data
 
     @classmethod
     def admin_deleted_product(cls, admin_id):
@@ -186,8 +210,10 @@ class Product(BaseModel):
         
 class ProductImage(BaseModel):
     __tablename__ = 'product_images'
+    __photo_fields__ = ("image_path",)
 
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    image_path = db.Column(db.String(300), nullable=False)
     
 # Auto-generate SKU before insert if not supplied
 @event.listens_for(Product, "before_insert")
@@ -232,11 +258,14 @@ class OrderItem(BaseModel):
 
 class Order(BaseModel):
     __tablename__ = "orders"
+    # Keyset pagination of a user's order history
+    __table_args__ = (db.Index("ix_orders_user_created_id", "user_id", "created_at", "id"),)
 
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     total_price = db.Column(db.Numeric(12, 2), nullable=False)
     status = db.Column(db.String(50), default="Pending")
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Python-side default keeps the stored format identical to bound cursor values
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     shipping_address_id = db.Column(db.Integer, db.ForeignKey("addresses.id"), nullable=True)
     coupon_id = db.Column(db.Integer, db.ForeignKey("coupons.id"), nullable=True)
 
@@ -288,25 +317,63 @@ class Transaction(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     payment_id = db.Column(db.Integer, db.ForeignKey("payments.id"), nullable=False)
-    gateway_transaction_id = db.Column(db.String(200), nullable=False, index=True, unique=False)
+    # Unique so retried gateway webhooks are rejected by the index
+    gateway_transaction_id = db.Column(db.String(200), nullable=False, index=True, unique=True)
     status = db.Column(db.String(50), nullable=True)
-    raw_response = db.Column(db.Text, nullable=True)
+    raw_response = db.Column(db.LargeBinary, nullable=True)  # zlib-compressed gateway body
+    applied = db.Column(db.Boolean, default=False, index=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    def set_raw_response(self, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.raw_response = zlib.compress(body, 6) if body else None
+
+    def get_raw_response(self):
+        return zlib.decompress(self.raw_response).decode("utf-8") if self.raw_response else None
+
 
 class ProductReview(db.Model):
     __tablename__ = "product_reviews"
 
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    # active_history loads the old values on change even when the review was expired,
+    # so app_dir.ratings can take them out of the right aggregate bucket
+    product_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False), active_history=True
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    rating = db.Column(db.Integer, nullable=False)
+    rating = db.column_property(db.Column(db.Integer, nullable=False), active_history=True)
     review_text = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    __table_args__ = (db.CheckConstraint("rating BETWEEN 1 AND 5", name="ck_product_reviews_rating"),)
+
     # relationships: backrefs already exist via foreign keys and Product/User definitions
 
 
+class ProductRating(db.Model):
+    """Denormalized review aggregates, kept in step with ProductReview by app_dir.ratings."""
+    __tablename__ = "product_ratings"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    def summary(self):
+        count = self.rating_count or 0
+        return {
+            "count": count,
+            "average": round((self.rating_sum or 0) / count, 2) if count else None,
+            "histogram": {str(star): getattr(self, f"rating_{star}") or 0 for star in range(1, 6)},
+        }
+
+
 class InventoryLog(db.Model):
     __tablename__ = "inventory_logs"
 
@@ -338,12 +405,37 @@ class Address(db.Model):
 
 class Wishlist(db.Model):
     __tablename__ = "wishlist"
+    # Alert job joins changed products to their wishlist rows
+    __table_args__ = (db.Index("ix_wishlist_product_user", "product_id", "user_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    # Baseline and dedupe state for app_dir.wishlist_alerts
+    alert_price = db.Column(db.Numeric(10, 2), nullable=True)
+    last_price_alert_at = db.Column(db.DateTime, nullable=True)
+    last_stock_alert_at = db.Column(db.DateTime, nullable=True)
+
+
+# Price drops are measured from the price when the item was wishlisted
+@event.listens_for(Wishlist, "before_insert")
+def set_wishlist_alert_price(mapper, connection, target):
+    if target.alert_price is None:
+        target.alert_price = connection.execute(
+            db.text("SELECT item_price FROM products WHERE id = :id"),
+            {"id": target.product_id}
+        ).scalar()
+
+
+class JobWatermark(db.Model):
+    """High-water mark of the last change a background job has processed."""
+    __tablename__ = "job_watermarks"
+
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.DateTime, nullable=False)
+
 
 class Coupon(db.Model):
     __tablename__ = "coupons"
@@ -355,11 +447,13 @@ class Coupon(db.Model):
     start_date = db.Column(db.DateTime, nullable=False)
     expiration_date = db.Column(db.DateTime, nullable=False)
     usage_limit = db.Column(db.Integer, default=0)  # 0 = unlimited
+    used_count = db.Column(db.Integer, nullable=False, default=0)  # only bumped by app_dir.coupons.redeem_coupon
     active = db.Column(db.Boolean, default=True)
 
 
 class Notification(db.Model):
     __tablename__ = "notifications"
+    __table_args__ = (db.Index("ix_notifications_user_read", "user_id", "is_read"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -378,4 +472,48 @@ class ActivityLog(db.Model):
     user_agent = db.Column(db.String(300), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+class DailyProductSales(db.Model):
+    """Paid order items rolled up per order day and product (see app_dir.sales)."""
+    __tablename__ = "daily_product_sales"
+    __table_args__ = (db.Index("ix_daily_product_sales_admin_day", "admin_id", "day"),)
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailySellerSales(db.Model):
+    """Paid orders rolled up per order day and seller (Product.admin_id)."""
+    __tablename__ = "daily_seller_sales"
+
+    admin_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ProductRecommendation(db.Model):
+    """Top-K "frequently bought together" neighbours, rebuilt by app_dir.recommendations."""
+    __tablename__ = "product_recommendations"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    recommended_product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+
+
+class MaintenanceRun(db.Model):
+    __tablename__ = "maintenance_runs"
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(100), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    duration_ms = db.Column(db.Float, nullable=False)
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+
 # End of models
@@ -0,0 +1,195 @@
+import threading, time
+from collections import deque, OrderedDict
+from sqlalchemy import event, select, update, func
+from sqlalchemy.orm import Session
+from app_dir import db
+from app_dir.models import Notification
+
+
+class Subscription:
+    """One open stream. Holds at most `maxlen` undelivered messages."""
+    __slots__ = ("user_id", "_messages", "_ready")
+
+    def __init__(self, user_id, maxlen=50):
+        self.user_id = user_id
+        self._messages = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+
+    def push(self, message):
+        self._messages.append(message)
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Return pending (event, data) messages, or [] after `timeout` seconds."""
+        if not self._ready.wait(timeout):
+            return []
+        self._ready.clear()
+        messages = []
+        while self._messages:
+            messages.append(self._messages.popleft())
+        return messages
+
+
+class InProcessBroker:
+    """Fan-out to subscribers in this process.
+
+    A shared broker (e.g. Redis pub/sub) only needs the same three methods,
+    delivering published messages to the local subscriptions of every process.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, maxlen=50):
+        sub = Subscription(user_id, maxlen)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            sub.push(message)
+
+    def stream_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+class NotificationHub:
+    """Delivers new notifications to open streams and caches unread counts."""
+
+    def __init__(self, app=None, broker=None):
+        self.broker = broker or InProcessBroker()
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_size = 10000
+        self.cache_ttl = 60
+        self.heartbeat = 15
+        self.stream_buffer = 50
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, broker=None):
+        app.config.setdefault("NOTIFICATION_HEARTBEAT", 15)
+        app.config.setdefault("NOTIFICATION_STREAM_BUFFER", 50)
+        app.config.setdefault("NOTIFICATION_COUNT_CACHE_SIZE", 10000)
+        app.config.setdefault("NOTIFICATION_COUNT_CACHE_TTL", 60)
+        if broker is not None:
+            self.broker = broker
+        self.heartbeat = app.config["NOTIFICATION_HEARTBEAT"]
+        self.stream_buffer = app.config["NOTIFICATION_STREAM_BUFFER"]
+        self.cache_size = app.config["NOTIFICATION_COUNT_CACHE_SIZE"]
+        self.cache_ttl = app.config["NOTIFICATION_COUNT_CACHE_TTL"]
+        app.extensions["notifications"] = self
+
+    # Unread counts
+
+    def unread_count(self, user_id):
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.cache_ttl:
+                self._counts.move_to_end(user_id)
+                return entry[0]
+        count = db.session.execute(
+            select(func.count(Notification.id))
+            .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+        ).scalar()
+        with self._lock:
+            self._counts[user_id] = (count, time.monotonic())
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    def _adjust(self, user_id, delta):
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry is None:
+                return None
+            count = max(entry[0] + delta, 0)
+            self._counts[user_id] = (count, entry[1])
+            return count
+
+    def invalidate_counts(self, user_ids=None):
+        """Forget cached counts for `user_ids` (all users by default) after bulk writes."""
+        with self._lock:
+            if user_ids is None:
+                self._counts.clear()
+            else:
+                for user_id in user_ids:
+                    self._counts.pop(user_id, None)
+
+    # Writes
+
+    def notification_created(self, data):
+        count = self._adjust(data["user_id"], 1)
+        self.broker.publish(data["user_id"], ("notification", data))
+        if count is not None:
+            self.broker.publish(data["user_id"], ("unread", {"count": count}))
+
+    def mark_read(self, user_id, ids=None):
+        """Mark the user's unread notifications (or just `ids`) read with one UPDATE."""
+        stmt = update(Notification).where(Notification.user_id == user_id, Notification.is_read.is_(False))
+        if ids is not None:
+            stmt = stmt.where(Notification.id.in_(ids))
+        result = db.session.execute(stmt.values(is_read=True).execution_options(synchronize_session=False))
+        db.session.commit()
+
+        if ids is None:
+            with self._lock:
+                self._counts[user_id] = (0, time.monotonic())
+            count = 0
+        else:
+            count = self._adjust(user_id, -result.rowcount)
+        if count is None:
+            count = self.unread_count(user_id)
+        self.broker.publish(user_id, ("unread", {"count": count}))
+        return result.rowcount
+
+    # Streams
+
+    def subscribe(self, user_id):
+        return self.broker.subscribe(user_id, self.stream_buffer)
+
+    def unsubscribe(self, sub):
+        self.broker.unsubscribe(sub)
+
+
+notification_hub = NotificationHub()
+
+
+# Publish only once the insert is committed
+@event.listens_for(Notification, "after_insert")
+def _notification_inserted(mapper, connection, target):
+    if target.is_read:
+        return
+    # created_at may be a server default not loaded yet; don't trigger a refresh mid-flush
+    created_at = target.__dict__.get("created_at")
+    Session.object_session(target).info.setdefault("new_notifications", []).append({
+        "id": target.id,
+        "user_id": target.user_id,
+        "title": target.title,
+        "message": target.message,
+        "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else None,
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    for data in session.info.pop("new_notifications", ()):
+        notification_hub.notification_created(data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session):
+    session.info.pop("new_notifications", None)
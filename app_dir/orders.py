@@ -0,0 +1,80 @@
+import base64, datetime
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import selectinload
+from app_dir import db
+from app_dir.images import resolve_photo
+from app_dir.models import Order, OrderItem
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+
+
+def _serialize(order):
+    payment = order.payment
+    return {
+        "id": order.id,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "status": order.status,
+        "total_price": str(order.total_price),
+        "payment": {
+            "status": payment.payment_status,
+            "method": payment.payment_method,
+            "amount": str(payment.amount),
+        } if payment else None,
+        "items": [
+            {
+                "product_id": item.product_id,
+                "name": item.product.item_name if item.product else None,
+                "photo": resolve_photo(item.product.item_photo) if item.product else None,
+                "quantity": item.quantity,
+                "unit_price": str(item.unit_price),
+            }
+            for item in order.order_items
+        ],
+    }
+
+
+def order_history(user_id, limit=20, cursor=None):
+    """One page of a user's orders, newest first, keyed on (created_at, id).
+
+    Items, products and payments come from selectinload, so a page costs a
+    fixed number of queries however many items each order has.
+    """
+    stmt = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+        .options(
+            selectinload(Order.order_items).selectinload(OrderItem.product),
+            selectinload(Order.payment),
+        )
+    )
+    if cursor:
+        created_at, order_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id),
+        ))
+
+    orders = db.session.execute(stmt).scalars().all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    return {
+        "orders": [_serialize(order) for order in orders],
+        "next_cursor": encode_cursor(orders[-1]) if has_more else None,
+    }
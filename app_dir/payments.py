@@ -0,0 +1,254 @@
+import atexit, queue, threading, time
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+
+# gateway status -> (Payment.payment_status, Order.status); None means nothing to apply
+STATUS_MAP = {
+    "pending": None,
+    "succeeded": ("Paid", "Paid"),
+    "failed": ("Failed", "Payment Failed"),
+    "refunded": ("Refunded", "Refunded"),
+}
+# payment_status a payment may move to -> statuses it may move from
+ALLOWED_FROM = {
+    "Paid": ("Pending", "Failed"),
+    "Failed": ("Pending",),
+    "Refunded": ("Paid",),
+}
+# Order.status an order may move to -> statuses it may move from. Refunds also apply
+# to fulfilment statuses (e.g. Shipped) set after payment, so they exclude instead.
+ORDER_ALLOWED_FROM = {
+    "Paid": ("Pending", "Payment Failed"),
+    "Payment Failed": ("Pending",),
+}
+ORDER_NOT_REFUNDABLE = ("Pending", "Payment Failed", "Refunded")
+
+
+class DuplicateEvent(Exception):
+    pass
+
+
+class UnknownPayment(Exception):
+    pass
+
+
+def record_webhook(payment_id, gateway_transaction_id, status, raw_body):
+    """Insert the gateway transaction; the unique index rejects retries.
+
+    Returns (transaction_id, needs_apply). Raises DuplicateEvent for an already seen
+    gateway_transaction_id and UnknownPayment for a bad payment_id.
+    """
+    from app_dir import db
+    from app_dir.models import Transaction, Payment
+
+    # PK lookup; SQLite doesn't enforce the foreign key on its own
+    if db.session.get(Payment, payment_id) is None:
+        raise UnknownPayment(payment_id)
+
+    txn = Transaction(
+        payment_id=payment_id,
+        gateway_transaction_id=gateway_transaction_id,
+        status=status,
+        applied=STATUS_MAP.get(status) is None,
+    )
+    txn.set_raw_response(raw_body)
+    db.session.add(txn)
+    try:
+        db.session.flush()
+        transaction_id, needs_apply = txn.id, not txn.applied
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise DuplicateEvent(gateway_transaction_id)
+    return transaction_id, needs_apply
+
+
+class PaymentEventApplier:
+    """Applies webhook status transitions to payments and orders in batches."""
+
+    def __init__(self, app=None):
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app_dir import db
+        from app_dir.models import Payment, Order, Transaction
+        from app_dir.sales import record_order_sales
+
+        app.config.setdefault("PAYMENT_APPLY_BATCH_SIZE", 500)
+        app.config.setdefault("PAYMENT_APPLY_INTERVAL", 0.2)
+        app.config.setdefault("PAYMENT_PENDING_SWEEP_INTERVAL", 300)
+        self.batch_size = app.config["PAYMENT_APPLY_BATCH_SIZE"]
+        self.interval = app.config["PAYMENT_APPLY_INTERVAL"]
+        self.sweep_interval = app.config["PAYMENT_PENDING_SWEEP_INTERVAL"]
+        self.logger = app.logger
+        self._record_sales = record_order_sales
+        self._payments = Payment.__table__
+        self._orders = Order.__table__
+        self._transactions = Transaction.__table__
+        self._queue = queue.Queue()
+        with app.app_context():
+            self._engine = db.engine
+        app.extensions["payment_applier"] = self
+        atexit.register(self.shutdown)
+
+    def submit(self, transaction_id, payment_id, status):
+        if self._queue is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="payment-applier", daemon=True)
+                    self._thread.start()
+        self._queue.put((transaction_id, payment_id, status))
+
+    def _run(self):
+        # Events acked before a restart or crash, or from failed batches, are only in the table
+        self._sweep_pending()
+        next_sweep = time.monotonic() + self.sweep_interval
+        while not self._stop.is_set():
+            if time.monotonic() >= next_sweep:
+                self._sweep_pending()
+                next_sweep = time.monotonic() + self.sweep_interval
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._safe_apply(batch)
+        self.drain()
+
+    def drain(self):
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self._safe_apply(batch)
+
+    def _safe_apply(self, batch):
+        try:
+            self.apply(batch)
+        except Exception:
+            # Rows stay applied=False and are picked up by the next pending sweep
+            self.logger.exception("Failed to apply %d payment events", len(batch))
+
+    def _sweep_pending(self):
+        try:
+            count = self.apply_pending()
+        except Exception:
+            self.logger.exception("Failed to apply pending payment events")
+            return
+        if count:
+            self.logger.info("Applied %d pending payment events", count)
+
+    def apply(self, batch):
+        """Apply (transaction_id, payment_id, status) events in one transaction.
+
+        Events are grouped into rounds so each payment still walks through its
+        statuses in gateway order (e.g. succeeded then refunded). Only orders
+        whose payment actually changed status move, so repeated gateway events
+        never re-apply a transition or double count sales.
+        """
+        sequences = {}
+        for transaction_id, payment_id, status in sorted(batch):
+            if STATUS_MAP.get(status) is None:
+                continue
+            seq = sequences.setdefault(payment_id, [])
+            if not seq or seq[-1] != status:
+                seq.append(status)
+
+        rounds = []
+        for payment_id, seq in sequences.items():
+            for i, status in enumerate(seq):
+                if len(rounds) <= i:
+                    rounds.append({})
+                rounds[i].setdefault(status, []).append(payment_id)
+
+        payments, orders, transactions = self._payments, self._orders, self._transactions
+        with self._engine.begin() as conn:
+            for by_status in rounds:
+                for status, payment_ids in by_status.items():
+                    payment_status, order_status = STATUS_MAP[status]
+                    changed = conn.execute(
+                        select(payments.c.id, payments.c.order_id)
+                        .where(
+                            payments.c.id.in_(payment_ids),
+                            payments.c.payment_status.in_(ALLOWED_FROM[payment_status]),
+                        )
+                        .with_for_update()
+                    ).all()
+                    if not changed:
+                        continue
+                    conn.execute(
+                        update(payments)
+                        .where(payments.c.id.in_([row.id for row in changed]))
+                        .values(payment_status=payment_status)
+                    )
+                    order_ids = conn.execute(
+                        select(orders.c.id)
+                        .where(
+                            orders.c.id.in_({row.order_id for row in changed}),
+                            self._order_source(order_status),
+                        )
+                        .with_for_update()
+                    ).scalars().all()
+                    if not order_ids:
+                        continue
+                    conn.execute(update(orders).where(orders.c.id.in_(order_ids)).values(status=order_status))
+                    # Sales rollups commit together with the status change
+                    if order_status == "Paid":
+                        self._record_sales(conn, order_ids, 1)
+                    elif order_status == "Refunded":
+                        self._record_sales(conn, order_ids, -1)
+            conn.execute(
+                update(transactions)
+                .where(transactions.c.id.in_([event[0] for event in batch]))
+                .values(applied=True)
+            )
+
+    def _order_source(self, order_status):
+        status = self._orders.c.status
+        if order_status == "Refunded":
+            return and_(status.is_not(None), status.not_in(ORDER_NOT_REFUNDABLE))
+        # NULL predates the "Pending" default
+        return or_(status.is_(None), status.in_(ORDER_ALLOWED_FROM[order_status]))
+
+    def apply_pending(self):
+        """Re-apply transactions that were stored but never applied. Returns the count."""
+        transactions = self._transactions
+        total = 0
+        last_id = 0
+        while True:
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    select(transactions.c.id, transactions.c.payment_id, transactions.c.status)
+                    .where(transactions.c.applied.is_(False), transactions.c.id > last_id)
+                    .order_by(transactions.c.id)
+                    .limit(self.batch_size)
+                ).all()
+            if not rows:
+                return total
+            self.apply([tuple(row) for row in rows])
+            total += len(rows)
+            last_id = rows[-1][0]
+
+    def shutdown(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
@@ -0,0 +1,190 @@
+import abc, math, re, threading, time
+from functools import wraps
+from flask import request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+def parse_rate(rate):
+    """'5/minute' or '3/15minutes' -> (capacity, tokens refilled per second)."""
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}")
+    count, multiplier, unit = match.groups()
+    period = PERIODS[unit] * int(multiplier or 1)
+    return int(count), int(count) / period
+
+
+class TokenBucketStore(abc.ABC):
+    """Interface for bucket storage.
+
+    `take` must atomically refill the bucket for `key`, try to remove `cost`
+    tokens and return (allowed, retry_after_seconds). A store shared between
+    processes (see RedisTokenBucketStore) makes limits hold across workers.
+    """
+
+    @abc.abstractmethod
+    def take(self, key, capacity, refill_rate, cost=1):
+        ...
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """Per-process buckets in lock-striped dicts.
+
+    A bucket left alone for capacity/refill_rate seconds is full again, the
+    same as having no bucket, so idle entries are swept without changing any
+    outcome. `max_keys` caps memory if traffic outruns the sweep.
+    """
+
+    def __init__(self, stripes=64, max_keys=100000, sweep_every=1024):
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+        self._max_per_stripe = max(max_keys // stripes, 1)
+        self._sweep_every = sweep_every
+        self._ops = [0] * stripes
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        index = hash(key) % len(self._stripes)
+        buckets, lock = self._stripes[index]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            if tokens >= cost:
+                buckets[key] = (tokens - cost, now, now + capacity / refill_rate)
+                allowed, retry_after = True, 0.0
+            else:
+                buckets[key] = (tokens, now, now + capacity / refill_rate)
+                allowed, retry_after = False, (cost - tokens) / refill_rate
+
+            self._ops[index] += 1
+            if self._ops[index] >= self._sweep_every or len(buckets) > self._max_per_stripe:
+                self._ops[index] = 0
+                self._sweep(buckets, now)
+        return allowed, retry_after
+
+    def _sweep(self, buckets, now):
+        for key in [k for k, b in buckets.items() if b[2] <= now]:
+            del buckets[key]
+        if len(buckets) > self._max_per_stripe:
+            # Still over budget: forget the least recently touched half
+            oldest = sorted(buckets, key=lambda k: buckets[k][1])[: len(buckets) // 2]
+            for key in oldest:
+                del buckets[key]
+
+
+class RedisTokenBucketStore(TokenBucketStore):
+    """Shared buckets for multi-process deployments, using a server-side script."""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        allowed, tokens = self._script(
+            keys=[self._prefix + key], args=[capacity, refill_rate, cost, time.time()]
+        )
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / refill_rate
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.store = None
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_STORE", None)
+        self.enabled = app.config["RATELIMIT_ENABLED"]
+        self.store = app.config["RATELIMIT_STORE"] or InMemoryTokenBucketStore()
+        app.extensions["rate_limiter"] = self
+
+
+def _client_ip():
+    # Behind a reverse proxy this is only the client's address when
+    # TRUSTED_PROXY_HOPS is set, otherwise every client shares the proxy's IP
+    return request.remote_addr or "unknown"
+
+
+def _user_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return f"user:{identity}" if identity else f"ip:{_client_ip()}"
+
+
+def _email_key():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        # Runs before the view, so a list or string body must fall through to its validation
+        data = {}
+    email = data.get("email") or request.form.get("email")
+    return f"email:{email.strip().lower()}" if isinstance(email, str) and email.strip() else None
+
+
+KEY_FUNCS = {
+    "ip": lambda: f"ip:{_client_ip()}",
+    "user": _user_key,
+    "email": _email_key,
+}
+
+
+def rate_limit(rate, key="ip"):
+    """Limit a view to `rate` per key ("ip", "user", "email" or a callable).
+
+    Checked before the view body runs, so rejected requests never reach the
+    database. Stack the decorator to combine limits. A key function that
+    returns None skips that limit for the request.
+    """
+    capacity, refill_rate = parse_rate(rate)
+    key_func = KEY_FUNCS[key] if isinstance(key, str) else key
+    kind = key if isinstance(key, str) else getattr(key, "__name__", "custom")
+
+    def decorator(view):
+        scope = f"{view.__module__}.{view.__name__}:{kind}:{rate}"
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            if limiter is not None and limiter.enabled:
+                value = key_func()
+                if value is not None:
+                    allowed, retry_after = limiter.store.take(f"{scope}:{value}", capacity, refill_rate)
+                    if not allowed:
+                        from app_dir import json_err
+                        resp, code = json_err("Too many requests. Try again later", 429)
+                        resp.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+                        return resp, code
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+from sqlalchemy import event, select, update, insert, delete, func, case, inspect
+from app_dir import db
+from app_dir.models import Product, ProductReview, ProductRating
+
+STARS = range(1, 6)
+
+
+def _apply(connection, product_id, rating, delta):
+    """Add `delta` reviews with `rating` to a product's aggregates in one UPDATE."""
+    table = ProductRating.__table__
+    values = {
+        "rating_count": table.c.rating_count + delta,
+        "rating_sum": table.c.rating_sum + delta * rating,
+        f"rating_{rating}": table.c[f"rating_{rating}"] + delta,
+    }
+    result = connection.execute(update(table).where(table.c.product_id == product_id).values(**values))
+    if result.rowcount == 0 and delta > 0:
+        # Product predates the aggregates table; start its row from this review
+        connection.execute(insert(table).values(
+            product_id=product_id, rating_count=1, rating_sum=rating, **{f"rating_{rating}": 1}
+        ))
+
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(state.object, name)
+
+
+@event.listens_for(Product, "after_insert")
+def _create_rating_row(mapper, connection, target):
+    if target.__dict__.get("rating_stats") is None:
+        connection.execute(insert(ProductRating.__table__).values(product_id=target.id))
+
+
+@event.listens_for(ProductReview, "after_insert")
+def _review_added(mapper, connection, target):
+    _apply(connection, target.product_id, target.rating, 1)
+
+
+@event.listens_for(ProductReview, "after_update")
+def _review_changed(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.rating.history.has_changes() or state.attrs.product_id.history.has_changes()):
+        return
+    _apply(connection, _old_value(state, "product_id"), _old_value(state, "rating"), -1)
+    _apply(connection, target.product_id, target.rating, 1)
+
+
+@event.listens_for(ProductReview, "after_delete")
+def _review_removed(mapper, connection, target):
+    _apply(connection, target.product_id, target.rating, -1)
+
+
+def rebuild_ratings(batch_size=1000):
+    """Recompute every product's aggregates from product_reviews. Returns rows written."""
+    columns = [
+        ProductReview.product_id,
+        func.count(ProductReview.id),
+        func.coalesce(func.sum(ProductReview.rating), 0),
+    ] + [func.sum(case((ProductReview.rating == star, 1), else_=0)) for star in STARS]
+    stmt = select(*columns).group_by(ProductReview.product_id)
+
+    aggregates = {row[0]: row[1:] for row in db.session.execute(stmt)}
+    product_ids = db.session.execute(select(Product.id)).scalars().all()
+
+    rows = []
+    for product_id in product_ids:
+        count, total, *hist = aggregates.get(product_id, (0, 0, 0, 0, 0, 0, 0))
+        row = {"product_id": product_id, "rating_count": count, "rating_sum": total}
+        row.update({f"rating_{star}": hist[star - 1] for star in STARS})
+        rows.append(row)
+
+    db.session.execute(delete(ProductRating))
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(ProductRating), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
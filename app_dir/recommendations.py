@@ -0,0 +1,133 @@
+import heapq
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import create_engine, select, delete, insert, func
+from app_dir.models import OrderItem, Product, ProductRecommendation
+
+# Orders with more distinct products than this are treated as bulk buys and skipped
+MAX_ITEMS_PER_ORDER = 50
+
+
+def _prune(counts, keep):
+    """Keep only the `keep` strongest neighbours of every product, in place."""
+    for product_id, neighbours in counts.items():
+        if len(neighbours) > keep:
+            counts[product_id] = Counter(dict(neighbours.most_common(keep)))
+
+
+def count_range(conn, first_order_id, last_order_id, chunk_size, prune_at):
+    """Sparse co-occurrence counts for orders in [first_order_id, last_order_id].
+
+    Streams order_items in order-id chunks. Neighbour lists are pruned to
+    `prune_at` entries whenever one grows past twice that, which bounds memory
+    at the cost of approximate counts for long-tail pairs.
+    """
+    counts = defaultdict(Counter)
+    last_id = first_order_id - 1
+    while last_id < last_order_id:
+        upper = min(last_id + chunk_size, last_order_id)
+        rows = conn.execute(
+            select(OrderItem.order_id, OrderItem.product_id)
+            .where(OrderItem.order_id > last_id, OrderItem.order_id <= upper)
+            .order_by(OrderItem.order_id)
+        ).all()
+        last_id = upper
+
+        baskets = defaultdict(set)
+        for order_id, product_id in rows:
+            baskets[order_id].add(product_id)
+
+        grew = False
+        for products in baskets.values():
+            if len(products) < 2 or len(products) > MAX_ITEMS_PER_ORDER:
+                continue
+            for a in products:
+                neighbours = counts[a]
+                for b in products:
+                    if a != b:
+                        neighbours[b] += 1
+                grew = grew or len(neighbours) > 2 * prune_at
+        if grew:
+            _prune(counts, prune_at)
+    return counts
+
+
+def _count_range_worker(db_url, first_order_id, last_order_id, chunk_size, prune_at):
+    engine = create_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            counts = count_range(conn, first_order_id, last_order_id, chunk_size, prune_at)
+            _prune(counts, prune_at)
+    finally:
+        engine.dispose()
+    return {a: dict(neighbours) for a, neighbours in counts.items()}
+
+
+def build_recommendations(engine, top_k=10, chunk_size=5000, workers=0):
+    """Recompute the top-K neighbours table. Returns rows written.
+
+    With `workers` > 0 the order-id space is split across a process pool and
+    the partial counts are merged before the final top-K cut.
+    """
+    prune_at = top_k * 4
+    with engine.connect() as conn:
+        first, last = conn.execute(select(func.min(OrderItem.order_id), func.max(OrderItem.order_id))).one()
+        if first is None:
+            counts = {}
+        elif workers:
+            span = (last - first) // workers + 1
+            ranges = [(first + i * span, min(first + (i + 1) * span - 1, last)) for i in range(workers)]
+            db_url = engine.url.render_as_string(hide_password=False)
+            counts = defaultdict(Counter)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_count_range_worker, db_url, lo, hi, chunk_size, prune_at)
+                    for lo, hi in ranges if lo <= hi
+                ]
+                for future in futures:
+                    for a, neighbours in future.result().items():
+                        counts[a].update(neighbours)
+        else:
+            counts = count_range(conn, first, last, chunk_size, prune_at)
+
+        live = set(conn.execute(
+            select(Product.id).where(Product.is_deleted.is_(False), Product.is_active.is_(True))
+        ).scalars())
+
+    rows = []
+    for product_id, neighbours in counts.items():
+        best = heapq.nlargest(
+            top_k,
+            ((score, b) for b, score in neighbours.items() if b in live),
+            key=lambda item: (item[0], -item[1]),
+        )
+        rows.extend(
+            {"product_id": product_id, "rank": rank, "recommended_product_id": b, "score": score}
+            for rank, (score, b) in enumerate(best, start=1)
+        )
+
+    table = ProductRecommendation.__table__
+    with engine.begin() as conn:
+        conn.execute(delete(table))
+        for start in range(0, len(rows), 1000):
+            conn.execute(insert(table), rows[start:start + 1000])
+    return len(rows)
+
+
+def recommendations_for(session, product_id):
+    """Neighbours of one product from the precomputed table (primary-key range scan)."""
+    rows = session.execute(
+        select(
+            ProductRecommendation.recommended_product_id, ProductRecommendation.score,
+            Product.item_name, Product.item_price, Product.item_photo,
+        )
+        .join(Product, Product.id == ProductRecommendation.recommended_product_id)
+        .where(
+            ProductRecommendation.product_id == product_id,
+            # The table is rebuilt nightly; drop products retired since then
+            Product.is_deleted.is_(False),
+            Product.is_active.is_(True),
+        )
+        .order_by(ProductRecommendation.rank)
+    ).all()
+    return rows
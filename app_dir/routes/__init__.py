@@ -1,5 +1,7 @@
 from app_dir.routes.auths import auth_bp
 from app_dir.routes.users import user_bp
 from app_dir.routes.products_bp import product_bp
+from app_dir.routes.payments import payment_bp
+from app_dir.routes.notifications import notification_bp
 
-all_bps = [auth_bp, user_bp, product_bp]
\ No newline at end of file
+all_bps = [auth_bp, user_bp, product_bp, payment_bp, notification_bp]
\ No newline at end of file
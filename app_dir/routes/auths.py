@@ -1,8 +1,9 @@
 from flask import Blueprint, request, current_app
 from app_dir.models import User, OTP
-from app_dir import allow_files, UPLOAD_FOLDER, json_err, json_ok, generate_otp, send_emails, db
-from werkzeug.utils import secure_filename
-import os, datetime
+from app_dir import allow_files, json_err, json_ok, generate_otp, send_emails, db, log_writer
+from app_dir.images import save_upload
+from app_dir.rate_limit import rate_limit
+import datetime
 from flask_jwt_extended import get_jwt_identity, create_access_token, create_refresh_token, jwt_required, set_refresh_cookies, unset_jwt_cookies, set_access_cookies
 
 auth_bp = Blueprint("auths", __name__, url_prefix="/auths")
@@ -10,6 +11,7 @@ MAX_OTP_ATTEMPTS = 5
 
 # REGISTER ROUTE
 @auth_bp.route("/register", methods=["POST"])
+@rate_limit("10/hour", key="ip")
 def register():
     try:
         username = request.form.get("username")
@@ -32,17 +34,8 @@ def register():
     if User.query.filter_by(email=email).first() or User.query.filter_by(phone=phone).first():
         return json_err("User Exist with Email or Password", 400)
 
-    # Save photo
-    filename = secure_filename(user_photo.filename)
-    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{filename}"
-    image_path = os.path.join(UPLOAD_FOLDER)
-    os.makedirs(image_path, exist_ok=True)
-
-    file_path = os.path.join(image_path, filename)
-    user_photo.save(file_path)
-
-    relative_path = f"uploads/{filename}"
+    # Save photo (content-addressed, thumbnails generated in background)
+    relative_path = save_upload(user_photo)
 
     # Create User
 
@@ -55,11 +48,14 @@ def register():
 
     new_user.set_password(password)
     new_user.save()
+    log_writer.log_activity(new_user.id, "register", request.remote_addr, request.user_agent.string)
 
     return json_ok({"user": new_user.to_dict()}, 200)
 
 
 @auth_bp.route("/login", methods=["POST"])
+@rate_limit("20/minute", key="ip")
+@rate_limit("5/minute", key="email")
 def login():
     data = request.get_json(silent=True)
 
@@ -100,6 +96,7 @@ def login():
     user.reset_start_time = None
     user.reset_end_time = None
     db.session.commit()
+    log_writer.log_activity(user.id, "login", request.remote_addr, request.user_agent.string)
 
     # Generate tokens
     access_token = create_access_token(identity=str(user.id))
@@ -118,6 +115,8 @@ def login():
 
 # FORGOT PASSWORD AND SEND OTP CODE
 @auth_bp.route("/forgot_password", methods=['POST'])
+@rate_limit("5/minute", key="ip")
+@rate_limit("3/15minutes", key="email")
 def forgot_password():
     try:
         email = request.json.get("email")
@@ -149,6 +148,8 @@ def forgot_password():
 
 # Check OTP
 @auth_bp.route("/check_otp", methods=['POST'])
+@rate_limit("10/minute", key="ip")
+@rate_limit("5/minute", key="email")
 def check_otp():
     try:
         otp_code = request.json.get("otp_code")
@@ -187,7 +188,7 @@ def check_otp():
 
     if not user:
         return json_err("User not exist or error Please Try again", 404)
-    
+    log_writer.log_activity(user.id, "otp_login", request.remote_addr, request.user_agent.string)
 
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
@@ -215,6 +216,7 @@ def change_password():
     
     user.set_password(new_password)
     user.save()
+    log_writer.log_activity(user.id, "password_change", request.remote_addr, request.user_agent.string)
 
     return json_ok({"user":user.to_dict()})
 
@@ -0,0 +1,100 @@
+from flask import Blueprint, request, current_app
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from app_dir import json_err, json_ok
+from app_dir.models import Notification
+from app_dir.notifications import notification_hub
+import json
+
+notification_bp = Blueprint("notifications", __name__, url_prefix="/notifications")
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@notification_bp.route("/stream", methods=['GET'])
+@jwt_required()
+def stream():
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    unread = notification_hub.unread_count(user_id)
+    heartbeat = notification_hub.heartbeat
+    sub = notification_hub.subscribe(user_id)
+
+    def events():
+        try:
+            yield sse("unread", {"count": unread})
+            while True:
+                messages = sub.wait(heartbeat)
+                if not messages:
+                    yield ": ping\n\n"
+                    continue
+                for event, data in messages:
+                    yield sse(event, data)
+        finally:
+            notification_hub.unsubscribe(sub)
+
+    return current_app.response_class(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@notification_bp.route("/unread_count", methods=['GET'])
+@jwt_required()
+def unread_count():
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception as e:
+        return json_err(str(e), 400)
+    return json_ok({"count": notification_hub.unread_count(user_id)})
+
+
+@notification_bp.route("/", methods=['GET'])
+@jwt_required()
+def list_notifications():
+    try:
+        user_id = int(get_jwt_identity())
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        unread_only = request.args.get("unread", "").lower() in ("1", "true", "yes")
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    query = Notification.query.filter_by(user_id=user_id)
+    if unread_only:
+        query = query.filter_by(is_read=False)
+    notifications = query.order_by(Notification.id.desc()).limit(limit).all()
+
+    return json_ok({"notifications": [
+        {
+            "id": n.id,
+            "title": n.title,
+            "message": n.message,
+            "is_read": n.is_read,
+            "created_at": n.created_at.isoformat() if n.created_at else None,
+        }
+        for n in notifications
+    ]})
+
+
+@notification_bp.route("/mark_read", methods=['POST'])
+@jwt_required()
+def mark_read():
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True) or {}
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    ids = data.get("ids")
+    if ids is None and not data.get("all"):
+        return json_err("Send ids or all=true")
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return json_err("ids must be a list of integers")
+
+    updated = notification_hub.mark_read(user_id, ids)
+    return json_ok({"updated": updated, "unread": notification_hub.unread_count(user_id)})
@@ -0,0 +1,59 @@
+from flask import Blueprint, request, current_app
+from app_dir import json_err, json_ok, payment_applier
+from app_dir.payments import record_webhook, DuplicateEvent, UnknownPayment, STATUS_MAP
+import hmac, hashlib
+
+payment_bp = Blueprint("payments", __name__, url_prefix="/payments")
+
+
+def valid_signature(body, signature, secret):
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+
+# Acknowledge as soon as the event is stored; status changes are applied in batches
+@payment_bp.route("/webhook", methods=["POST"])
+def webhook():
+    body = request.get_data(cache=True)
+    secret = current_app.config.get("PAYMENT_WEBHOOK_SECRET")
+    if secret:
+        if not valid_signature(body, request.headers.get("X-Signature"), secret):
+            return json_err("Invalid signature", 401)
+    elif not current_app.debug:
+        # Fail closed: unsigned events could mark any payment Paid
+        return json_err("Payment webhooks are not configured", 503)
+
+    # Malformed events get a 400; a 5xx would only make the gateway retry them
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return json_err("Invalid request body", 400)
+
+    gateway_transaction_id = data.get("transaction_id")
+    payment_id = data.get("payment_id")
+    status = data.get("status")
+
+    if not all([gateway_transaction_id, payment_id, status]):
+        return json_err("transaction_id, payment_id and status required", 400)
+    if not isinstance(gateway_transaction_id, (str, int)) or isinstance(gateway_transaction_id, bool):
+        return json_err("transaction_id must be a string", 400)
+    if isinstance(payment_id, str) and payment_id.isdigit():
+        payment_id = int(payment_id)
+    if not isinstance(payment_id, int) or isinstance(payment_id, bool):
+        return json_err("payment_id must be an integer", 400)
+    if not isinstance(status, str):
+        return json_err("status must be a string", 400)
+    status = status.lower()
+
+    if status not in STATUS_MAP:
+        return json_err(f"Unknown status {status}", 400)
+
+    try:
+        transaction_id, needs_apply = record_webhook(payment_id, str(gateway_transaction_id), status, body)
+    except DuplicateEvent:
+        return json_ok({"duplicate": True}, 200)
+    except UnknownPayment:
+        return json_err("Payment not found", 404)
+
+    if needs_apply:
+        payment_applier.submit(transaction_id, payment_id, status)
+    return json_ok({"duplicate": False}, 200)
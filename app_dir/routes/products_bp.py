@@ -1,18 +1,63 @@
 from app_dir.models import User, Product
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, current_app
 import datetime, os
-from app_dir import allow_files, UPLOAD_FOLDER, db
+from app_dir import allow_files, UPLOAD_FOLDER, db, json_err, json_ok
+from app_dir.compression import cache_compressed
+from app_dir.catalog import get_category_tree_json, search_products, SEARCH_SORTS
+from app_dir.recommendations import recommendations_for
+from app_dir.images import resolve_photo
 from werkzeug.utils import secure_filename
 
 
 product_bp = Blueprint("products", __name__, url_prefix="/product")
 
 @product_bp.route("/get_all_products", methods=['GET'])
+@cache_compressed
 def get_all_products():
     products = Product.query.all()
     return jsonify({"products":[product.to_dict() for product in products if not product.is_deleted]})
 
+@product_bp.route("/categories", methods=['GET'])
+@cache_compressed
+def get_categories():
+    return current_app.response_class(get_category_tree_json(), mimetype="application/json")
+
+@product_bp.route("/search", methods=['GET'])
+def search():
+    try:
+        filters = {
+            "category_id": request.args.get("category_id", type=int),
+            "subcategory_id": request.args.get("subcategory_id", type=int),
+            "min_price": request.args.get("min_price", type=float),
+            "max_price": request.args.get("max_price", type=float),
+            "in_stock": request.args.get("in_stock", "").lower() in ("1", "true", "yes"),
+        }
+        page = max(request.args.get("page", 1, type=int), 1)
+        per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+        sort = request.args.get("sort", "newest")
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    if sort not in SEARCH_SORTS:
+        return json_err(f"Unknown sort {sort}", 400)
+
+    return json_ok(search_products(filters, page, per_page, sort))
+
+@product_bp.route("/<int:product_id>/recommendations", methods=['GET'])
+def get_recommendations(product_id):
+    rows = recommendations_for(db.session, product_id)
+    return json_ok({"recommendations": [
+        {
+            "product_id": recommended_id,
+            "score": score,
+            "item_name": name,
+            "item_price": str(price),
+            "item_photo": resolve_photo(photo),
+        }
+        for recommended_id, score, name, price, photo in rows
+    ]})
+
 @product_bp.route("/delete_product", methods=["POST"])
 @jwt_required()
 def delete_product():
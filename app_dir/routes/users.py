@@ -1,9 +1,13 @@
 from app_dir.models import User, Product, CartItem, Address
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask import request, jsonify, Blueprint
-import datetime, os
-from app_dir import allow_files, UPLOAD_FOLDER, json_err, json_ok
-from werkzeug.utils import secure_filename
+from app_dir import allow_files, json_err, json_ok, log_writer, db
+from app_dir.images import save_upload
+from app_dir.coupons import validate_coupon, redeem_coupon, CouponError
+from app_dir.orders import order_history, InvalidCursor
+from app_dir.rate_limit import rate_limit
+from app_dir.sales import seller_daily, seller_products
+import datetime
 
 ERROR = {"msg":"error"}
 SUCCESS = {"msg":"success"}
@@ -59,6 +63,7 @@ def add_address():
 
 @user_bp.route("/add_product", methods=['POST'])
 @jwt_required()
+@rate_limit("30/minute", key="user")
 def add_product():
     try:
         item_name = request.form.get("item_name")
@@ -83,15 +88,7 @@ def add_product():
     
     if item_photo and allow_files(item_photo.filename):
         try:
-            filename = secure_filename(item_photo.filename)
-            timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
-            filename = f"{timestamp}_{user.id}_{filename}"
-            image_path = os.path.join(UPLOAD_FOLDER)
-            os.makedirs(image_path, exist_ok=True)
-            file_path = os.path.join(image_path, filename )
-            item_photo.save(file_path)
-            
-            relative_path = f"uploads/{filename}"
+            relative_path = save_upload(item_photo)
         except Exception as e:
             return jsonify({"error":str(e)})
 
@@ -104,6 +101,7 @@ def add_product():
         admin_id = user.id
     )
     new_product.save()
+    log_writer.log_inventory(new_product.id, 0, new_product.item_stock, "initial")
     return jsonify({"product":new_product.to_dict(), "msg":"ok"}), 200
     
 @user_bp.route("/get_admin_products", methods=['GET'])
@@ -127,6 +125,7 @@ def get_admin_products():
 
 @user_bp.route("/add_to_cart", methods=['POST'])
 @jwt_required()
+@rate_limit("30/minute", key="user")
 def add_to_cart():
     try:
         admin_id = int(get_jwt_identity())
@@ -190,5 +189,111 @@ def clear_cart():
     for item in cart_item:
         item.delete()
 
+@user_bp.route("/apply_coupon", methods=['POST'])
+@jwt_required()
+def apply_coupon():
+    try:
+        code = request.json.get("code")
+        subtotal = request.json.get("subtotal")
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    if not code or subtotal is None:
+        return json_err("Coupon code and subtotal required")
+
+    try:
+        coupon, discount = validate_coupon(code, subtotal)
+    except CouponError as e:
+        return json_err(str(e), 400)
+    except ArithmeticError:
+        return json_err("Invalid subtotal", 400)
+
+    return json_ok({"code": coupon["code"], "discount": str(discount)})
+
+@user_bp.route("/redeem_coupon", methods=['POST'])
+@jwt_required()
+@rate_limit("30/minute", key="user")
+def redeem_coupon_route():
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError("Invalid request body")
+        code = data.get("code")
+        order_id = data.get("order_id")
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    if not code or not isinstance(order_id, int) or isinstance(order_id, bool):
+        return json_err("Coupon code and order_id required")
+
+    try:
+        coupon, discount, total = redeem_coupon(code, order_id, user_id)
+        db.session.commit()
+    except CouponError as e:
+        db.session.rollback()
+        return json_err(str(e), 400)
+    except ArithmeticError:
+        db.session.rollback()
+        return json_err("Invalid order total", 400)
+
+    return json_ok({"code": coupon["code"], "discount": str(discount), "order_id": order_id, "total_price": str(total)})
+
+@user_bp.route("/orders", methods=['GET'])
+@jwt_required()
+def get_orders():
+    try:
+        user_id = int(get_jwt_identity())
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        cursor = request.args.get("cursor")
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    try:
+        page = order_history(user_id, limit, cursor)
+    except InvalidCursor:
+        return json_err("Invalid cursor", 400)
+
+    return json_ok(page)
+
+def sales_range():
+    """(start, end) dates from the query string, defaulting to the last 30 days."""
+    end = request.args.get("end")
+    end = datetime.date.fromisoformat(end) if end else datetime.datetime.utcnow().date()
+    start = request.args.get("start")
+    start = datetime.date.fromisoformat(start) if start else end - datetime.timedelta(days=29)
+    if start > end:
+        raise ValueError("start must be before end")
+    return start, end
+
+@user_bp.route("/sales/daily", methods=['GET'])
+@jwt_required()
+def get_sales_daily():
+    try:
+        user_id = int(get_jwt_identity())
+        start, end = sales_range()
+    except Exception as e:
+        return json_err(str(e), 400)
+
+    admin = User.query.filter_by(id=user_id).first()
+    if not admin or not admin.is_admin:
+        return json_err("Admin Not Found", 404)
+
+    return json_ok({"start": start.isoformat(), "end": end.isoformat(),
+                    "days": seller_daily(db.session, admin.id, start, end)})
+
+@user_bp.route("/sales/products", methods=['GET'])
+@jwt_required()
+def get_sales_products():
+    try:
+        user_id = int(get_jwt_identity())
+        start, end = sales_range()
+    except Exception as e:
+        return json_err(str(e), 400)
 
+    admin = User.query.filter_by(id=user_id).first()
+    if not admin or not admin.is_admin:
+        return json_err("Admin Not Found", 404)
 
+    return json_ok({"start": start.isoformat(), "end": end.isoformat(),
+                    "products": seller_products(db.session, admin.id, start, end)})
@@ -0,0 +1,152 @@
+import datetime
+from sqlalchemy import select, update, insert, delete, func, distinct
+from sqlalchemy.dialects import postgresql, sqlite
+from app_dir.models import Order, OrderItem, Payment, Product, DailyProductSales, DailySellerSales
+
+PAID_STATUS = "Paid"
+METRICS = ("units", "revenue", "order_count")
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _increment(conn, table, keys, rows):
+    """Add each row's METRICS to its rollup row, creating rows as needed."""
+    if not rows:
+        return
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[k] for k in keys],
+            set_={m: table.c[m] + stmt.excluded[m] for m in METRICS},
+        )
+        conn.execute(stmt, rows)
+        return
+
+    for row in rows:
+        where = [table.c[k] == row[k] for k in keys]
+        result = conn.execute(update(table).where(*where).values({m: table.c[m] + row[m] for m in METRICS}))
+        if result.rowcount == 0:
+            conn.execute(insert(table).values(**row))
+
+
+def record_order_sales(conn, order_ids, sign=1):
+    """Fold the items of `order_ids` into the daily rollups; sign=-1 reverses a refund.
+
+    Runs on the caller's connection so the rollup commits with the status change.
+    """
+    if not order_ids:
+        return
+    day = func.date(Order.created_at)
+    line_total = OrderItem.quantity * OrderItem.unit_price
+    base = (
+        select()
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.id.in_(order_ids))
+    )
+
+    product_rows = conn.execute(
+        base.add_columns(
+            day, OrderItem.product_id, Product.admin_id,
+            func.sum(OrderItem.quantity), func.sum(line_total), func.count(distinct(Order.id)),
+        ).group_by(day, OrderItem.product_id, Product.admin_id)
+    ).all()
+    _increment(conn, DailyProductSales.__table__, ("day", "product_id"), [
+        {
+            "day": _as_date(d), "product_id": product_id, "admin_id": admin_id,
+            "units": sign * units, "revenue": sign * revenue, "order_count": sign * orders,
+        }
+        for d, product_id, admin_id, units, revenue, orders in product_rows
+    ])
+
+    seller_rows = conn.execute(
+        base.add_columns(
+            day, Product.admin_id,
+            func.sum(OrderItem.quantity), func.sum(line_total), func.count(distinct(Order.id)),
+        ).group_by(day, Product.admin_id)
+    ).all()
+    _increment(conn, DailySellerSales.__table__, ("admin_id", "day"), [
+        {
+            "day": _as_date(d), "admin_id": admin_id,
+            "units": sign * units, "revenue": sign * revenue, "order_count": sign * orders,
+        }
+        for d, admin_id, units, revenue, orders in seller_rows
+    ])
+
+
+def backfill(engine, chunk_size=1000, start=None, end=None):
+    """Rebuild the rollups from paid orders in id-keyed chunks. Returns orders processed.
+
+    Orders count while their payment is Paid, whatever fulfilment status
+    (e.g. Shipped) the order has moved on to; refunded payments drop out.
+
+    Clears the rollups for the range first, so it must not run while the
+    payment applier is recording new sales for the same days.
+    """
+    day = func.date(Order.created_at)
+    with engine.begin() as conn:
+        for model in (DailyProductSales, DailySellerSales):
+            stmt = delete(model.__table__)
+            if start:
+                stmt = stmt.where(model.day >= start)
+            if end:
+                stmt = stmt.where(model.day <= end)
+            conn.execute(stmt)
+
+    processed = 0
+    last_id = 0
+    while True:
+        stmt = select(Order.id).where(
+            Order.id.in_(select(Payment.order_id).where(Payment.payment_status == PAID_STATUS)),
+            Order.id > last_id,
+        )
+        if start:
+            stmt = stmt.where(day >= start.isoformat())
+        if end:
+            stmt = stmt.where(day <= end.isoformat())
+        with engine.begin() as conn:
+            ids = conn.execute(stmt.order_by(Order.id).limit(chunk_size)).scalars().all()
+            if not ids:
+                return processed
+            record_order_sales(conn, ids)
+        processed += len(ids)
+        last_id = ids[-1]
+
+
+def seller_daily(session, admin_id, start, end):
+    rows = session.execute(
+        select(DailySellerSales.day, DailySellerSales.units, DailySellerSales.revenue, DailySellerSales.order_count)
+        .where(DailySellerSales.admin_id == admin_id, DailySellerSales.day.between(start, end))
+        .order_by(DailySellerSales.day)
+    ).all()
+    return [
+        {"day": d.isoformat(), "units": units, "revenue": str(revenue), "orders": orders}
+        for d, units, revenue, orders in rows
+    ]
+
+
+def seller_products(session, admin_id, start, end):
+    rows = session.execute(
+        select(
+            DailyProductSales.product_id,
+            func.sum(DailyProductSales.units),
+            func.sum(DailyProductSales.revenue),
+            func.sum(DailyProductSales.order_count),
+        )
+        .where(DailyProductSales.admin_id == admin_id, DailyProductSales.day.between(start, end))
+        .group_by(DailyProductSales.product_id)
+        .order_by(func.sum(DailyProductSales.revenue).desc())
+    ).all()
+    return [
+        {"product_id": product_id, "units": units, "revenue": str(revenue), "orders": orders}
+        for product_id, units, revenue, orders in rows
+    ]
@@ -0,0 +1,195 @@
+import datetime
+from sqlalchemy import select, insert, update, cast, literal, String, and_, or_, distinct
+from app_dir.models import Product, Wishlist, InventoryLog, Notification, JobWatermark
+from app_dir.notifications import notification_hub
+
+PRICE_WATERMARK = "wishlist_price_alerts"
+STOCK_WATERMARK = "wishlist_stock_alerts"
+# Re-read a little before the watermark; server-side timestamps may be truncated to seconds
+OVERLAP = datetime.timedelta(seconds=5)
+
+
+def _get_watermark(conn, name, default):
+    value = conn.execute(select(JobWatermark.value).where(JobWatermark.name == name)).scalar()
+    return value or default
+
+
+def _set_watermark(conn, name, value):
+    table = JobWatermark.__table__
+    result = conn.execute(update(table).where(table.c.name == name).values(value=value))
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(name=name, value=value))
+
+
+def _insert_notifications(conn, rows):
+    """INSERT ... SELECT `rows` into notifications. Returns (count, created rows).
+
+    Created rows are None on databases without INSERT ... RETURNING.
+    """
+    table = Notification.__table__
+    stmt = insert(table).from_select(["user_id", "title", "message", "is_read", "created_at"], rows)
+    if not conn.dialect.insert_returning:
+        return conn.execute(stmt).rowcount, None
+    created = conn.execute(
+        stmt.returning(table.c.id, table.c.user_id, table.c.title, table.c.message, table.c.created_at)
+    ).all()
+    return len(created), [
+        {
+            "id": row.id,
+            "user_id": row.user_id,
+            "title": row.title,
+            "message": row.message,
+            "created_at": row.created_at.isoformat() if hasattr(row.created_at, "isoformat") else None,
+        }
+        for row in created
+    ]
+
+
+def _publish(created):
+    """Hand committed notifications to open streams, as the ORM insert hook would."""
+    if created is None:
+        notification_hub.invalidate_counts()
+        return
+    for data in created:
+        notification_hub.notification_created(data)
+
+
+def _live(product_ids):
+    return and_(Product.id.in_(product_ids), Product.is_deleted.is_(False), Product.is_active.is_(True))
+
+
+def _price_batch(conn, product_ids, now, window):
+    """Notify wishlists whose product dropped below the price they last saw."""
+    wishlist = Wishlist.__table__
+    current_price = select(Product.item_price).where(Product.id == wishlist.c.product_id).scalar_subquery()
+
+    # New rows start from the current price without alerting
+    conn.execute(
+        update(wishlist)
+        .where(wishlist.c.product_id.in_(product_ids), wishlist.c.alert_price.is_(None))
+        .values(alert_price=current_price)
+    )
+
+    due = and_(
+        _live(product_ids),
+        Wishlist.product_id == Product.id,
+        Product.item_price < Wishlist.alert_price,
+        or_(Wishlist.last_price_alert_at.is_(None), Wishlist.last_price_alert_at < now - window),
+    )
+    # One notification per user and product, however many wishlist rows they have
+    count, created = _insert_notifications(
+        conn,
+        select(
+            Wishlist.user_id,
+            literal("Price drop"),
+            Product.item_name + literal(" is now ") + cast(Product.item_price, String),
+            literal(False),
+            literal(now),
+        ).where(due).group_by(Wishlist.user_id, Product.id, Product.item_name, Product.item_price),
+    )
+    conn.execute(
+        update(wishlist)
+        .where(
+            wishlist.c.product_id.in_(
+                select(Product.id).where(_live(product_ids))
+            ),
+            wishlist.c.alert_price > current_price,
+            or_(wishlist.c.last_price_alert_at.is_(None), wishlist.c.last_price_alert_at < now - window),
+        )
+        .values(alert_price=current_price, last_price_alert_at=now)
+    )
+    # Price went up: measure later drops from the new, higher price
+    conn.execute(
+        update(wishlist)
+        .where(wishlist.c.product_id.in_(product_ids), wishlist.c.alert_price < current_price)
+        .values(alert_price=current_price)
+    )
+    return count, created
+
+
+def _stock_batch(conn, product_ids, now, window):
+    """Notify wishlists whose product came back in stock."""
+    wishlist = Wishlist.__table__
+    due = and_(
+        _live(product_ids),
+        Product.item_stock > 0,
+        Wishlist.product_id == Product.id,
+        or_(Wishlist.last_stock_alert_at.is_(None), Wishlist.last_stock_alert_at < now - window),
+    )
+    count, created = _insert_notifications(
+        conn,
+        select(
+            Wishlist.user_id,
+            literal("Back in stock"),
+            Product.item_name + literal(" is back in stock"),
+            literal(False),
+            literal(now),
+        ).where(due).group_by(Wishlist.user_id, Product.id, Product.item_name),
+    )
+    conn.execute(
+        update(wishlist)
+        .where(
+            wishlist.c.product_id.in_(
+                select(Product.id).where(_live(product_ids), Product.item_stock > 0)
+            ),
+            or_(wishlist.c.last_stock_alert_at.is_(None), wishlist.c.last_stock_alert_at < now - window),
+        )
+        .values(last_stock_alert_at=now)
+    )
+    return count, created
+
+
+def _changed_ids(conn, stmt, column, batch_size):
+    """Yield batches of ids from `stmt`, keyed on `column` so each query is bounded."""
+    last_id = 0
+    while True:
+        ids = conn.execute(stmt.where(column > last_id).order_by(column).limit(batch_size)).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def run_wishlist_alerts(engine, batch_size=500, window=datetime.timedelta(hours=24), lookback=datetime.timedelta(days=1)):
+    """Turn product changes since the last run into wishlist notifications.
+
+    Each batch of changed products is one short transaction of set-based
+    INSERT ... SELECT / UPDATE statements over the (product_id, user_id)
+    wishlist index. New notifications are published to open streams once
+    their batch commits. Returns (price_alerts, stock_alerts).
+    """
+    now = datetime.datetime.utcnow()
+    with engine.connect() as conn:
+        price_since = _get_watermark(conn, PRICE_WATERMARK, now - lookback) - OVERLAP
+        stock_since = _get_watermark(conn, STOCK_WATERMARK, now - lookback) - OVERLAP
+
+    price_changed = select(Product.id).where(Product.update_date > price_since, Product.update_date <= now)
+    back_in_stock = (
+        select(distinct(InventoryLog.product_id))
+        .where(
+            InventoryLog.timestamp > stock_since,
+            InventoryLog.timestamp <= now,
+            InventoryLog.previous_stock <= 0,
+            InventoryLog.new_stock > 0,
+            # A new listing's opening stock was never out of stock
+            InventoryLog.change_type != "initial",
+        )
+    )
+
+    price_alerts = stock_alerts = 0
+    with engine.connect() as reader:
+        for ids in _changed_ids(reader, price_changed, Product.id, batch_size):
+            with engine.begin() as conn:
+                count, created = _price_batch(conn, ids, now, window)
+            _publish(created)
+            price_alerts += count
+        for ids in _changed_ids(reader, back_in_stock, InventoryLog.product_id, batch_size):
+            with engine.begin() as conn:
+                count, created = _stock_batch(conn, ids, now, window)
+            _publish(created)
+            stock_alerts += count
+
+    with engine.begin() as conn:
+        _set_watermark(conn, PRICE_WATERMARK, now)
+        _set_watermark(conn, STOCK_WATERMARK, now)
+    return price_alerts, stock_alerts
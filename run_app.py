@@ -5,7 +5,8 @@ app = create_app()
 
 @app.route("/uploads/<filename>")
 def send_photo(filename):
-    return send_file(f"{UPLOAD_FOLDER}/{filename}")
+    # Uploads are content-addressed, so a name always maps to the same bytes
+    return send_file(f"{UPLOAD_FOLDER}/{filename}", max_age=31536000)
 
 if __name__=="__main__":
     with app.app_context():
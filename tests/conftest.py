@@ -0,0 +1,19 @@
+import pytest
+from app_dir import create_app, db
+from app_dir.notifications import notification_hub
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # File-backed so worker threads share one database
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("RATELIMIT_ENABLED", "false")
+    app = create_app()
+    app.config["TESTING"] = True
+    # Module-level cache outlives each test's database
+    notification_hub.invalidate_counts()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,96 @@
+import datetime, threading
+import pytest
+from app_dir import db
+from app_dir.models import Coupon, User, Order, Payment
+from app_dir.coupons import redeem_coupon, validate_coupon, invalidate_coupons, CouponError
+
+
+@pytest.fixture
+def coupon(app):
+    now = datetime.datetime.utcnow()
+    coupon = Coupon(
+        code="SAVE10", discount_type="percent", value=10, usage_limit=25,
+        start_date=now - datetime.timedelta(days=1), expiration_date=now + datetime.timedelta(days=1),
+    )
+    db.session.add(coupon)
+    db.session.commit()
+    invalidate_coupons()
+    return coupon
+
+
+@pytest.fixture
+def buyer(app):
+    user = User(username="buyer", email="buyer@example.com", phone="555")
+    user.set_password("secret")
+    user.save()
+    return user
+
+
+def place_orders(user, count):
+    orders = [Order(user_id=user.id, total_price=100) for _ in range(count)]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [order.id for order in orders]
+
+
+def test_concurrent_redemptions_stop_at_usage_limit(app, coupon, buyer):
+    threads, attempts_per_thread = 8, 10
+    order_ids = place_orders(buyer, threads * attempts_per_thread)
+    user_id = buyer.id
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker(my_orders):
+        with app.app_context():
+            start.wait()
+            for order_id in my_orders:
+                try:
+                    redeem_coupon("save10", order_id, user_id)
+                    db.session.commit()
+                    outcome = True
+                except CouponError:
+                    db.session.rollback()
+                    outcome = False
+                with lock:
+                    results.append(outcome)
+
+    workers = [threading.Thread(target=worker, args=(order_ids[i::threads],)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    assert len(results) == threads * attempts_per_thread
+    assert results.count(True) == coupon.usage_limit
+    db.session.expire_all()
+    assert db.session.get(Coupon, coupon.id).used_count == coupon.usage_limit
+    assert Order.query.filter_by(coupon_id=coupon.id).count() == coupon.usage_limit
+
+
+def test_redemption_applies_to_one_owned_order(app, coupon, buyer):
+    (order_id,) = place_orders(buyer, 1)
+    db.session.add(Payment(order_id=order_id, payment_method="card", amount=100))
+    db.session.commit()
+
+    with pytest.raises(CouponError):
+        redeem_coupon("SAVE10", order_id, buyer.id + 1)
+    db.session.rollback()
+
+    _, discount, total = redeem_coupon("SAVE10", order_id, buyer.id)
+    db.session.commit()
+    assert (str(discount), str(total)) == ("10.00", "90.00")
+    assert db.session.get(Order, order_id).coupon_id == coupon.id
+    assert str(Payment.query.filter_by(order_id=order_id).one().amount) == "90.00"
+
+    # The order already carries a coupon; the second use is not counted
+    with pytest.raises(CouponError):
+        redeem_coupon("SAVE10", order_id, buyer.id)
+    db.session.rollback()
+    db.session.expire_all()
+    assert db.session.get(Coupon, coupon.id).used_count == 1
+
+
+def test_non_string_code_is_rejected(app, coupon):
+    with pytest.raises(CouponError):
+        validate_coupon(123, "10.00")
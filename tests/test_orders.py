@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app_dir import db
+from app_dir.models import User, Product, Order, OrderItem, Payment
+from app_dir.orders import order_history
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def make_user(name):
+    user = User(username=name, email=f"{name}@example.com", phone=name)
+    user.set_password("secret")
+    user.save()
+    return user
+
+
+@pytest.fixture
+def products(app):
+    seller = make_user("seller")
+    products = [Product(admin_id=seller.id, item_name=f"item {i}", item_price=5) for i in range(30)]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+
+def place_orders(user, products, orders, items_per_order):
+    for _ in range(orders):
+        order = Order(user_id=user.id, total_price=5 * items_per_order)
+        order.order_items = [
+            OrderItem(product_id=product.id, user_id=user.id, quantity=1, unit_price=5)
+            for product in products[:items_per_order]
+        ]
+        order.payment = Payment(payment_method="card", amount=order.total_price)
+        db.session.add(order)
+    db.session.commit()
+
+
+def history_queries(user_id, limit, cursor=None):
+    db.session.expire_all()
+    with count_queries() as statements:
+        page = order_history(user_id, limit, cursor)
+    return page, len(statements)
+
+
+def test_order_history_query_count_is_constant(app, products):
+    few, many = make_user("few"), make_user("many")
+    place_orders(few, products, orders=5, items_per_order=1)
+    place_orders(many, products, orders=5, items_per_order=25)
+    few_id, many_id = few.id, many.id
+
+    few_page, few_queries = history_queries(few_id, limit=3)
+    many_page, many_queries = history_queries(many_id, limit=3)
+    next_page, next_queries = history_queries(many_id, limit=3, cursor=many_page["next_cursor"])
+
+    # orders, order_items, products (ratings joined) and payments, whatever the order size
+    assert few_queries == many_queries == next_queries == 4
+    assert [len(o["items"]) for o in few_page["orders"]] == [1] * 3
+    assert [len(o["items"]) for o in many_page["orders"] + next_page["orders"]] == [25] * 5
+    assert next_page["next_cursor"] is None
@@ -0,0 +1,116 @@
+import hashlib, hmac, json
+import pytest
+from app_dir import db, payment_applier
+from app_dir.models import User, Order, Payment, Transaction
+from app_dir.payments import record_webhook
+
+SECRET = "test-webhook-secret"
+
+
+@pytest.fixture
+def payment(app):
+    user = User(username="buyer", email="buyer@example.com", phone="555")
+    user.set_password("secret")
+    user.save()
+    order = Order(user_id=user.id, total_price=20)
+    order.payment = Payment(payment_method="card", amount=20)
+    db.session.add(order)
+    db.session.commit()
+    yield order.payment
+    payment_applier.shutdown()
+
+
+def post_event(client, event, secret=None):
+    body = json.dumps(event).encode("utf-8")
+    headers = {}
+    if secret:
+        headers["X-Signature"] = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return client.post("/payments/webhook", data=body, content_type="application/json", headers=headers)
+
+
+def test_webhook_fails_closed_without_secret(app, payment):
+    app.config["PAYMENT_WEBHOOK_SECRET"] = None
+    event = {"transaction_id": "t1", "payment_id": payment.id, "status": "succeeded"}
+    resp = post_event(app.test_client(), event)
+    assert resp.status_code == 503
+    assert db.session.query(Transaction).count() == 0
+
+
+def test_webhook_rejects_bad_signature(app, payment):
+    app.config["PAYMENT_WEBHOOK_SECRET"] = SECRET
+    event = {"transaction_id": "t1", "payment_id": payment.id, "status": "succeeded"}
+    assert post_event(app.test_client(), event, secret="wrong").status_code == 401
+    assert post_event(app.test_client(), event, secret=SECRET).status_code == 200
+
+
+def test_applier_start_applies_stored_events(app, payment):
+    # Stored and acked, but lost from the in-memory queue (e.g. by a restart)
+    transaction_id, _ = record_webhook(payment.id, "lost", "succeeded", b"{}")
+    payment_applier.submit(-1, payment.id, "pending")
+    payment_applier.shutdown()
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).applied
+    assert db.session.get(Payment, payment.id).payment_status == "Paid"
+
+
+def test_repeated_success_does_not_reapply(app, payment):
+    from app_dir.models import Product, OrderItem, DailySellerSales
+    order = db.session.get(Order, payment.order_id)
+    product = Product(admin_id=order.user_id, item_name="widget", item_price=10)
+    db.session.add(product)
+    db.session.flush()
+    db.session.add(OrderItem(order_id=order.id, product_id=product.id, user_id=order.user_id, quantity=2, unit_price=10))
+    db.session.commit()
+
+    first, _ = record_webhook(payment.id, "charge-1", "succeeded", b"{}")
+    payment_applier.apply([(first, payment.id, "succeeded")])
+    order.status = "Shipped"
+    db.session.commit()
+    # Gateways send more than one success per charge
+    second, _ = record_webhook(payment.id, "charge-2", "succeeded", b"{}")
+    payment_applier.apply([(second, payment.id, "succeeded")])
+
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).status == "Shipped"
+    rollup = db.session.query(DailySellerSales).one()
+    assert (rollup.units, rollup.revenue, rollup.order_count) == (2, 20, 1)
+
+
+@pytest.mark.parametrize("event", [
+    [1, 2],
+    "succeeded",
+    {"transaction_id": "t1", "payment_id": 1, "status": 5},
+    {"transaction_id": "t1", "payment_id": [1], "status": "succeeded"},
+    {"transaction_id": "t1", "payment_id": {"a": 1}, "status": "succeeded"},
+    {"transaction_id": ["t1"], "payment_id": 1, "status": "succeeded"},
+])
+def test_malformed_signed_events_are_rejected(app, payment, event):
+    app.config["PAYMENT_WEBHOOK_SECRET"] = SECRET
+    assert post_event(app.test_client(), event, secret=SECRET).status_code == 400
+
+
+def test_digit_string_payment_id_is_accepted(app, payment):
+    app.config["PAYMENT_WEBHOOK_SECRET"] = SECRET
+    event = {"transaction_id": "t1", "payment_id": str(payment.id), "status": "Pending"}
+    assert post_event(app.test_client(), event, secret=SECRET).status_code == 200
+
+
+def test_backfill_keeps_shipped_orders(app, payment):
+    from app_dir.models import Product, OrderItem, DailySellerSales
+    from app_dir.sales import backfill
+    order = db.session.get(Order, payment.order_id)
+    product = Product(admin_id=order.user_id, item_name="widget", item_price=10)
+    db.session.add(product)
+    db.session.flush()
+    db.session.add(OrderItem(order_id=order.id, product_id=product.id, user_id=order.user_id, quantity=2, unit_price=10))
+    db.session.commit()
+
+    transaction_id, _ = record_webhook(payment.id, "charge-1", "succeeded", b"{}")
+    payment_applier.apply([(transaction_id, payment.id, "succeeded")])
+    order.status = "Shipped"
+    db.session.commit()
+
+    assert backfill(db.engine) == 1
+    rollup = db.session.query(DailySellerSales).one()
+    assert (rollup.units, rollup.revenue, rollup.order_count) == (2, 20, 1)
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def limited(app):
+    app.extensions["rate_limiter"].enabled = True
+    return app.test_client()
+
+
+@pytest.mark.parametrize("path", ["/auths/forgot_password", "/auths/check_otp"])
+@pytest.mark.parametrize("body", [[1, 2], "x"])
+def test_non_object_json_reaches_view_validation(limited, path, body):
+    assert limited.post(path, json=body).status_code == 400
+
+
+def test_email_limit_applies_per_address(limited):
+    body = {"email": "nobody@example.com"}
+    codes = [limited.post("/auths/forgot_password", json=body).status_code for _ in range(4)]
+    assert codes == [404, 404, 404, 429]
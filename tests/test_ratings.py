@@ -0,0 +1,45 @@
+from app_dir import db
+from app_dir.models import User, Product, ProductReview, ProductRating
+
+
+def histogram(product_id):
+    db.session.expire_all()
+    summary = db.session.get(ProductRating, product_id).summary()
+    return summary["count"], summary["histogram"]
+
+
+def buckets(**counts):
+    return {str(star): counts.get(f"s{star}", 0) for star in range(1, 6)}
+
+
+def test_incremental_aggregates_follow_review_edits(app):
+    user = User(username="reviewer", email="reviewer@example.com", phone="555")
+    user.set_password("secret")
+    user.save()
+    first = Product(admin_id=user.id, item_name="first", item_price=5)
+    second = Product(admin_id=user.id, item_name="second", item_price=5)
+    db.session.add_all([first, second])
+    db.session.commit()
+    first_id, second_id = first.id, second.id
+
+    review = ProductReview(product_id=first_id, user_id=user.id, rating=2)
+    db.session.add(review)
+    db.session.commit()
+    assert histogram(first_id) == (1, buckets(s2=1))
+
+    # Each edit follows a commit, so the review's old values are expired
+    review.rating = 3
+    db.session.commit()
+    review.rating = 5
+    db.session.commit()
+    assert histogram(first_id) == (1, buckets(s5=1))
+
+    review.product_id = second_id
+    db.session.commit()
+    assert histogram(first_id) == (0, buckets())
+    assert histogram(second_id) == (1, buckets(s5=1))
+
+    db.session.delete(review)
+    db.session.commit()
+    assert histogram(first_id) == (0, buckets())
+    assert histogram(second_id) == (0, buckets())
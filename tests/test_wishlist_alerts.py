@@ -0,0 +1,52 @@
+from app_dir import db
+from app_dir.models import User, Product, Wishlist, InventoryLog
+from app_dir.notifications import notification_hub
+from app_dir.wishlist_alerts import run_wishlist_alerts
+
+
+def make_shopper():
+    user = User(username="shopper", email="shopper@example.com", phone="555")
+    user.set_password("secret")
+    user.save()
+    return user
+
+
+def test_price_drop_reaches_streams_and_counts(app):
+    user = make_shopper()
+    product = Product(admin_id=user.id, item_name="lamp", item_price=30, item_stock=5)
+    db.session.add(product)
+    db.session.commit()
+    db.session.add(Wishlist(user_id=user.id, product_id=product.id))
+    db.session.commit()
+    user_id = user.id
+
+    assert notification_hub.unread_count(user_id) == 0  # cached
+    sub = notification_hub.subscribe(user_id)
+    try:
+        product.item_price = 20
+        db.session.commit()
+        price_alerts, _ = run_wishlist_alerts(db.engine)
+
+        assert price_alerts == 1
+        messages = sub.wait(1)
+        assert [event for event, _ in messages] == ["notification", "unread"]
+        assert messages[0][1]["title"] == "Price drop"
+        assert notification_hub.unread_count(user_id) == 1
+    finally:
+        notification_hub.unsubscribe(sub)
+
+
+def test_new_listing_is_not_back_in_stock(app):
+    user = make_shopper()
+    product = Product(admin_id=user.id, item_name="lamp", item_price=30, item_stock=5)
+    db.session.add(product)
+    db.session.flush()
+    # What /user/add_product logs for a new listing
+    db.session.add(InventoryLog(product_id=product.id, previous_stock=0, new_stock=5, change_type="initial"))
+    db.session.add(Wishlist(user_id=user.id, product_id=product.id))
+    db.session.commit()
+    assert run_wishlist_alerts(db.engine) == (0, 0)
+
+    db.session.add(InventoryLog(product_id=product.id, previous_stock=0, new_stock=3, change_type="restock"))
+    db.session.commit()
+    assert run_wishlist_alerts(db.engine) == (0, 1)